@@ -0,0 +1,231 @@
+"""Versioned JSON API for machine clients: /api/v1/power and /api/v1/stability.
+
+Both endpoints take one object keyed by feature name, or a batch as a list
+of objects / value lists (optionally wrapped as {"rows": [...]}), and never
+render a template. /api/v1/power?quantiles=0.1,0.5,0.9 (or a bare ?quantiles
+for P10/P50/P90) adds per-tree spread: std and the requested quantiles
+across the forest's trees. With drift monitors, inputs outside the range a
+model was trained on are listed under "out_of_range" (feature names for one
+row, {feature: row indices} for a batch) and in X-Input-Out-Of-Range, or
+rejected with 422 when DRIFT_REJECT_OUT_OF_RANGE is set. Batch responses can be negotiated as text/csv and large
+bodies are gzipped when the client accepts it. Errors are JSON with 400
+(malformed JSON), 406, 415 (not JSON) or 422 (invalid rows) statuses.
+"""
+import gzip
+import io
+import json
+import math
+
+import numpy as np
+from flask import Blueprint, current_app, request
+from werkzeug.exceptions import HTTPException
+
+from batch_predict import WEATHER_FEATURES, BatchInputError, predict_batch, predict_quantiles_batch, rows_from_json
+from drift import check_inputs
+from flat_forest import DEFAULT_QUANTILES
+from pipeline import GRID_FEATURES, stability_features
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STABILITY_INPUT = GRID_FEATURES + ['PowerGen']
+
+BATCH_TYPES = ['application/json', 'text/csv']
+
+
+# ********************************** Serialization **********************************
+def _tolist(value):
+    # Column slices and NumPy scalars orjson does not take natively
+    return value.tolist()
+
+
+def dumps(payload):
+    if orjson is not None:
+        # Serializes contiguous float64 arrays directly, without building Python floats first
+        return orjson.dumps(payload, default=_tolist, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':'), default=_tolist).encode()
+
+
+def to_csv(columns):
+    names = list(columns)
+    buffer = io.StringIO()
+    buffer.write(','.join(names) + '\n')
+    for row in zip(*(np.asarray(columns[name]).tolist() for name in names)):
+        buffer.write(','.join(map(str, row)) + '\n')
+    return buffer.getvalue().encode()
+
+
+def respond(body, mimetype, status=200, headers=None):
+    response = current_app.response_class(body, status=status, mimetype=mimetype, headers=headers)
+    response.vary.add('Accept-Encoding')
+    if len(body) >= current_app.config.get('API_GZIP_MIN_BYTES', 4096) and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, current_app.config.get('API_GZIP_LEVEL', 5)))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def error(status, message):
+    return respond(dumps({'error': message, 'status': status}), 'application/json', status)
+
+
+# ********************************** Input validation **********************************
+def read_json():
+    if not request.is_json:
+        raise HTTPException(response=error(415, 'Send application/json.'))
+    payload = request.get_json(silent=True)
+    if payload is None:
+        raise HTTPException(response=error(400, 'Request body is not valid JSON.'))
+    return payload
+
+
+def read_rows(payload, columns):
+    """(X, single) for one object keyed by the columns or a batch of rows."""
+    if isinstance(payload, dict) and 'rows' not in payload:
+        values = []
+        problems = []
+        for name in columns:
+            try:
+                value = float(payload[name])
+            except KeyError:
+                problems.append(f'{name} is required')
+                continue
+            except (TypeError, ValueError):
+                problems.append(f'{name} must be a number')
+                continue
+            if not math.isfinite(value):
+                # JSON NaN/Infinity and "nan"/"inf" strings parse, but no model can score them
+                problems.append(f'{name} must be finite')
+            values.append(value)
+        if problems:
+            raise BatchInputError('; '.join(problems) + '.')
+        return np.array([values], dtype=np.float64), True
+    return rows_from_json(payload, columns), False
+
+
+def read_quantiles():
+    return parse_quantiles(request.args.get('quantiles'))
+
+
+def parse_quantiles(value):
+    """Quantiles requested with ?quantiles=..., DEFAULT_QUANTILES for a bare ?quantiles, else None."""
+    if value is None:
+        return None
+    if not value.strip():
+        return DEFAULT_QUANTILES
+    try:
+        quantiles = tuple(float(q) for q in value.split(','))
+    except ValueError:
+        raise BatchInputError('quantiles must be comma-separated numbers between 0 and 1.')
+    if not all(0.0 <= q <= 1.0 for q in quantiles):
+        raise BatchInputError('quantiles must be comma-separated numbers between 0 and 1.')
+    return quantiles
+
+
+# ********************************** Blueprint **********************************
+def create_api(power_model, stability_model, score_power_row, score_stability_row, monitors=None):
+    """Blueprint serving the two models; the *_row callables score one row (e.g. through a cache).
+
+    monitors optionally maps 'power'/'stability' to the drift.DriftMonitor recording their inputs.
+    """
+    api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+    # Not `monitors or {}`: the caller may fill an empty dict in later (app1's warm_up())
+    monitors = {} if monitors is None else monitors
+
+    def check_ranges(kind, X, single):
+        return check_inputs(monitors.get(kind), X, single, current_app.config.get('DRIFT_REJECT_OUT_OF_RANGE', False))
+
+    def with_warnings(headers, flagged):
+        if not flagged:
+            return headers
+        return dict(headers or {}, **{'X-Input-Out-Of-Range': ','.join(flagged)})
+
+    def single_response(payload, headers, flagged):
+        if flagged:
+            payload['out_of_range'] = flagged
+        return respond(dumps(payload), 'application/json', headers=with_warnings(headers, flagged))
+
+    def model_headers(*models):
+        versions = [str(getattr(m, 'version', '')) for m in models]
+        return {'X-Model-Version': ','.join(versions)} if any(versions) else None
+
+    def batch_type():
+        # No Accept header means anything goes
+        if not request.accept_mimetypes:
+            return BATCH_TYPES[0]
+        mimetype = request.accept_mimetypes.best_match(BATCH_TYPES)
+        if mimetype is None:
+            raise HTTPException(response=error(406, f'Batch responses are available as {", ".join(BATCH_TYPES)}.'))
+        return mimetype
+
+    def batch_response(columns, headers, flagged=None):
+        headers = with_warnings(headers, flagged)
+        if batch_type() == 'text/csv':
+            return respond(to_csv(columns), 'text/csv', headers=headers)
+        payload = dict(columns, count=len(next(iter(columns.values()))))
+        if flagged:
+            payload['out_of_range'] = flagged
+        return respond(dumps(payload), 'application/json', headers=headers)
+
+    @api.route('/power', methods=['POST'])
+    def power():
+        try:
+            X, single = read_rows(read_json(), WEATHER_FEATURES)
+            quantiles = read_quantiles()
+            flagged = check_ranges('power', X, single)
+        except BatchInputError as e:
+            return error(422, str(e))
+        headers = model_headers(power_model)
+        if quantiles is not None:
+            return power_bands(X, single, quantiles, headers, flagged)
+        if single:
+            power_gen = float(score_power_row(X[0].tolist())[0])
+            return single_response({'PowerGen': power_gen}, headers, flagged)
+        power_gen = predict_batch(power_model, X, current_app.config['BATCH_CHUNK_SIZE'],
+                                  current_app.config['BATCH_N_JOBS'])
+        return batch_response({'PowerGen': power_gen}, headers, flagged)
+
+    def power_bands(X, single, quantiles, headers, flagged):
+        if single:
+            summary = power_model.predict_quantiles_one(X[0], quantiles)
+        else:
+            summary = predict_quantiles_batch(power_model, X, quantiles, current_app.config['BATCH_CHUNK_SIZE'])
+        columns = {'PowerGen' if name == 'mean' else name: values for name, values in summary.items()}
+        if single:
+            return single_response({name: float(values[0]) for name, values in columns.items()}, headers, flagged)
+        return batch_response(columns, headers, flagged)
+
+    @api.route('/stability', methods=['POST'])
+    def stability():
+        try:
+            X, single = read_rows(read_json(), STABILITY_INPUT)
+            flagged = check_ranges('stability', X, single)
+        except BatchInputError as e:
+            return error(422, str(e))
+        headers = model_headers(stability_model)
+        features = stability_features(X[:, :len(GRID_FEATURES)], X[:, len(GRID_FEATURES)])
+        if single:
+            labels = score_stability_row(features[0].tolist())
+        else:
+            labels = predict_batch(stability_model, features, current_app.config['BATCH_CHUNK_SIZE'],
+                                   current_app.config['BATCH_N_JOBS'])
+        columns = {
+            'stability': np.where(np.asarray(labels) == 1, 'Stable', 'Unstable').tolist(),
+            'power_gen1': features[:, 7],
+            'power_gen2': features[:, 8],
+            'power_gen3': features[:, 9],
+        }
+        if single:
+            return single_response({name: values[0] if name == 'stability' else float(values[0])
+                                    for name, values in columns.items()}, headers, flagged)
+        return batch_response(columns, headers, flagged)
+
+    @api.app_errorhandler(HTTPException)
+    def http_error(e):
+        # JSON errors under /api/ only; HTML routes keep the default error pages
+        if e.response is not None or not request.path.startswith(api.url_prefix + '/'):
+            return e
+        return error(e.code, e.description)
+
+    return api
@@ -1,21 +1,37 @@
 from flask import Flask, render_template, request, flash, redirect
 from flask_sqlalchemy import SQLAlchemy
 import numpy as np
-import joblib
-from sklearn.preprocessing import LabelEncoder
 import re
+import os
+from datetime import datetime
+from model_registry import registry
+from db_setup import add_missing_columns, tune_sqlite
+from auth import DEFAULT_HASH_METHOD, PasswordHasher
+from write_behind import WriteBehindLogger
+from metrics import init_app as init_metrics, instrument_session
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'models', 'final_power_gen_model.joblib')
 
 app = Flask(__name__, template_folder='templates')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///SustainaWatt.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SUSTAINAWATT_DATABASE_URI', 'sqlite:///SustainaWatt.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Prediction requests are logged by a background writer in bulk inserts instead of one commit per request
+app.config['WRITE_BEHIND'] = True
+app.config['WRITE_BEHIND_FLUSH_SIZE'] = 500
+app.config['WRITE_BEHIND_FLUSH_INTERVAL'] = 1.0
+app.config['METRICS_SAMPLE_RATE'] = 0.1
 app.secret_key = 'SustainaWatt'
 db = SQLAlchemy(app)
+init_metrics(app)
+instrument_session(db.session)
 
 class App1(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     airtemperature = db.Column(db.Float(), nullable=False)
     pressure = db.Column(db.Float(), nullable=False)
     windspeed = db.Column(db.Float(), nullable=False)
+    predicted_power = db.Column(db.Float(), nullable=True)
+    created_at = db.Column(db.DateTime(), nullable=True, default=datetime.utcnow)
 
 # ********************************** DB User table **********************************
 class User(db.Model):
@@ -24,7 +40,8 @@ class User(db.Model):
     lastName = db.Column(db.String(15), nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(80), nullable=False)
+    # Salted hash from auth.PasswordHasher, shared with app1.py
+    password = db.Column(db.String(255), nullable=False)
 
 # ********************************** DB Contact Us table **********************************
 class ContactMessage(db.Model):
@@ -36,7 +53,15 @@ class ContactMessage(db.Model):
 
 # ********************************** Creates all DB tables **********************************
 with app.app_context():
+    tune_sqlite(db.engine)
     db.create_all()
+    add_missing_columns(db.engine, App1.__table__)
+
+prediction_log = WriteBehindLogger(app, db, App1.__table__,
+                                   flush_size=app.config['WRITE_BEHIND_FLUSH_SIZE'],
+                                   flush_interval=app.config['WRITE_BEHIND_FLUSH_INTERVAL'])
+# Same salted hashes as app1.py, so both apps can share a database
+hasher = PasswordHasher(os.environ.get('SUSTAINAWATT_HASH_METHOD', DEFAULT_HASH_METHOD))
     
 
 name_pattern = re.compile(r'^[a-zA-Z]{1,15}$')
@@ -72,11 +97,6 @@ def app1():
         pressure = float(request.form['pressure'])
         wind_speed = float(request.form['windspeed'])
 
-        new_App1 = App1(airtemperature=air_temperature, pressure=pressure, windspeed=wind_speed)
-
-        db.session.add(new_App1)
-        db.session.commit()
-
         user_response_app1 = {
             'AirTemp': air_temperature,
             'Pressure': pressure,
@@ -84,16 +104,21 @@ def app1():
         }
 
         # Creating a feature vector for the model input
-        label_encoder = LabelEncoder()
-        for column in user_response_app1.keys():
-            user_response_app1[column] = label_encoder.fit_transform([user_response_app1[column]])[0]
-
         features = [user_response_app1[column] for column in user_response_app1.keys()]
         user_input = np.array(features).reshape(1, -1)
 
-        # Using the loaded model to predict the screening score
-        loaded_model = joblib.load('static/models/final_power_gen_model.joblib', mmap_mode=None)
-        user_screening_score = loaded_model.predict_proba(user_input)[:, 1]
+        # Using the shared, memory-mapped model to predict the power generation
+        loaded_model = registry.get(MODEL_PATH)
+        user_screening_score = loaded_model.predict(user_input)
+
+        # Record the request together with its prediction
+        record = dict(airtemperature=air_temperature, pressure=pressure, windspeed=wind_speed,
+                      predicted_power=float(user_screening_score[0]), created_at=datetime.utcnow())
+        if app.config['WRITE_BEHIND']:
+            prediction_log.log(**record)
+        else:
+            db.session.add(App1(**record))
+            db.session.commit()
 
         # Outputting the screening score
         print(user_screening_score)
@@ -139,7 +164,8 @@ def sign_up():
             return redirect('/signup')
 
         # If all validation passes, create a new user
-        new_user = User(firstName=firstName, lastName=lastName, username=username, email=email, password=password)
+        new_user = User(firstName=firstName, lastName=lastName, username=username, email=email,
+                        password=hasher.hash(password))
         db.session.add(new_user)
         db.session.commit()
 
@@ -161,7 +187,11 @@ def sign_in():
 
         if user:
             # Check if the password matches
-            if user.password == password:
+            matches, needs_rehash = hasher.verify(user.password, password)
+            if matches:
+                if needs_rehash:
+                    user.password = hasher.hash(password)
+                    db.session.commit()
                 flash('sign_in successful!', 'success')
                 return redirect('/home')
             else:
@@ -1,31 +1,90 @@
-from flask import Flask, render_template, request, flash, redirect
+# Importing this module only declares the app; create_app() (or the first request) runs warm_up(), which creates
+# missing tables and loads the models and drift references. Serve it with e.g. gunicorn --preload 'app1:create_app()'
+from startup import StartupProfile
+startup_profile = StartupProfile()
+
+from flask import Flask, render_template, request, flash, redirect, jsonify, session, g
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 import numpy as np
-import joblib
-from sklearn.preprocessing import LabelEncoder
+import math
 import re
-import pickle
+import os
+import threading
+from datetime import datetime
+from db_setup import add_missing_columns, create_missing_indexes, tune_sqlite
+from auth import PasswordHasher, SessionCache, hash_fingerprint, validate_session
+from model_manager import ModelManager, ModelRejected
+from metrics import init_app as init_metrics, instrument_session, stage
+from api import create_api
+from drift import DriftMonitor, check_inputs
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher
+from batch_predict import WEATHER_FEATURES, BatchInputError, predict_batch, read_weather_csv, rows_from_json
+from pipeline import PIPELINE_FEATURES, predict_grid
+from timeseries_store import TimeSeriesStore
+from rollups import RollupStore
+startup_profile.mark('imports')
 
 app = Flask(__name__, template_folder='templates')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///SustainaWatt.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SUSTAINAWATT_DATABASE_URI', 'sqlite:///SustainaWatt.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['BATCH_CHUNK_SIZE'] = 4096
+app.config['BATCH_N_JOBS'] = None
+# The compiled single-row path is sub-millisecond, so coalescing requests is opt-in for heavy concurrent load
+app.config['MICRO_BATCHING'] = False
+app.config['MICRO_BATCH_MAX_SIZE'] = 64
+app.config['MICRO_BATCH_MAX_WAIT_MS'] = 2.0
+# Prediction caches; quantization is one step per input feature, e.g. (0.01, 0.0001, 0.01).
+# A TTL of None never expires entries, 0 turns the caches off
+app.config['PREDICTION_CACHE_SIZE'] = 10000
+app.config['PREDICTION_CACHE_TTL'] = 300.0
+app.config['PREDICTION_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+app.config['POWER_CACHE_QUANTIZE'] = None
+app.config['STABILITY_CACHE_QUANTIZE'] = None
+# Seconds between checks for a newly published model; None turns the watcher off (admin reload still works)
+app.config['MODEL_RELOAD_INTERVAL'] = 10.0
+# /admin endpoints require this X-Admin-Token; without one they only answer requests from localhost
+app.config['ADMIN_TOKEN'] = os.environ.get('SUSTAINAWATT_ADMIN_TOKEN')
+# Fraction of requests whose route and stage latency is recorded on /metrics; counts are always exact
+app.config['METRICS_SAMPLE_RATE'] = 0.1
+# /api/v1 responses at least this large are gzipped for clients that accept it
+app.config['API_GZIP_MIN_BYTES'] = 4096
+app.config['API_GZIP_LEVEL'] = 5
+# Password hash cost, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'; existing hashes are upgraded at sign-in
+app.config['AUTH_HASH_METHOD'] = os.environ.get('SUSTAINAWATT_HASH_METHOD', 'pbkdf2:sha256:600000')
+app.config['AUTH_HASH_WORKERS'] = None
+# Signed-in sessions are re-checked against the database at most once per TTL
+app.config['AUTH_SESSION_CACHE_TTL'] = 60.0
+app.config['AUTH_SESSION_CACHE_SIZE'] = 10000
+# Inputs outside the training data's range, widened by this fraction of it, are flagged (or rejected when set);
+# drift scores cover the last one to two windows of traffic
+app.config['DRIFT_TOLERANCE'] = 0.1
+app.config['DRIFT_WINDOW'] = 3600.0
+app.config['DRIFT_REJECT_OUT_OF_RANGE'] = False
 app.secret_key = 'SustainaWatt'
 db = SQLAlchemy(app)
+init_metrics(app)
+instrument_session(db.session)
 
 class App1(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     airtemperature = db.Column(db.Float(), nullable=False)
     pressure = db.Column(db.Float(), nullable=False)
     windspeed = db.Column(db.Float(), nullable=False)
+    predicted_power = db.Column(db.Float(), nullable=True)
+    created_at = db.Column(db.DateTime(), nullable=True, default=datetime.utcnow)
 
 # ********************************** DB User table **********************************
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     firstName = db.Column(db.String(15), nullable=False)
     lastName = db.Column(db.String(15), nullable=False)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(80), nullable=False)
+    username = db.Column(db.String(80), unique=True, index=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, index=True, nullable=False)
+    # Salted hash from auth.PasswordHasher; scrypt hashes run to about 160 characters
+    password = db.Column(db.String(255), nullable=False)
 
 # ********************************** DB Contact Us table **********************************
 class ContactMessage(db.Model):
@@ -36,9 +95,75 @@ class ContactMessage(db.Model):
     description = db.Column(db.Text, nullable=False)
 
 # ********************************** Creates all DB tables **********************************
-with app.app_context():
+def init_db():
+    tune_sqlite(db.engine)
     db.create_all()
-    
+    add_missing_columns(db.engine, App1.__table__)
+    create_missing_indexes(db.engine, User.__table__)
+
+# ********************************** Startup **********************************
+warm_up_lock = threading.Lock()
+
+def warm_up():
+    # Once per process; loading here rather than on import keeps module import fast
+    with warm_up_lock:
+        if startup_profile.ready_ms is not None:
+            return
+        with startup_profile.phase('database'), app.app_context():
+            init_db()
+        # Everything sized or tuned by app.config is built here, after create_app()'s overrides
+        build_auth()
+        for kind, manager in managers.items():
+            manager.poll_interval = app.config['MODEL_RELOAD_INTERVAL']
+            with startup_profile.phase(f'model {kind}'):
+                manager.load()
+        build_batchers()
+        build_caches()
+        with startup_profile.phase('drift references'):
+            for kind in ('power', 'stability'):
+                monitors[kind] = DriftMonitor.from_csv(kind, tolerance=app.config['DRIFT_TOLERANCE'],
+                                                       window=app.config['DRIFT_WINDOW'])
+        startup_profile.ready()
+        app.logger.info('Ready in %.0f ms: %s', startup_profile.ready_ms, startup_profile.report()['phases_ms'])
+
+def create_app(config=None):
+    """Apply config overrides, warm up and return the app; there is one app per process.
+
+    Overrides are only accepted before the app has warmed up (first create_app() or request).
+    SQLALCHEMY_DATABASE_URI is read on import, so set SUSTAINAWATT_DATABASE_URI instead.
+    """
+    if config:
+        if startup_profile.ready_ms is not None:
+            raise RuntimeError('create_app(config) must be called before the app has warmed up.')
+        app.config.update(config)
+    warm_up()
+    return app
+
+@app.before_request
+def ensure_warm():
+    # Servers pointed at app1:app instead of create_app() warm up on the first request
+    if startup_profile.ready_ms is None:
+        warm_up()
+
+@app.route('/ready')
+def ready():
+    return jsonify(ready=True, startup=startup_profile.report())
+
+
+# ********************************** Authentication **********************************
+def build_auth():
+    global hasher, session_cache
+    hasher = PasswordHasher(app.config['AUTH_HASH_METHOD'], app.config['AUTH_HASH_WORKERS'])
+    session_cache = SessionCache(app.config['AUTH_SESSION_CACHE_SIZE'], app.config['AUTH_SESSION_CACHE_TTL'])
+
+def load_fingerprint(user_id):
+    row = db.session.query(User.username, User.password).filter_by(id=user_id).first()
+    return (row.username, hash_fingerprint(row.password)) if row is not None else None
+
+@app.before_request
+def load_user():
+    # g.user is the signed-in username; the database is only asked when the cache entry is missing or stale
+    g.user = validate_session(session, session_cache, load_fingerprint) if 'user_id' in session else None
 
 name_pattern = re.compile(r'^[a-zA-Z]{1,15}$')
 username_pattern = re.compile(r'^[a-z0-9_.]{6,}$')
@@ -65,58 +190,270 @@ def forgotpassword():
 def home():
     return render_template('home.html')
 
-# Load the trained machine learning model
-model = joblib.load('final_power_gen_model.joblib')
+# Load the trained machine learning model, compiled to flat arrays shared between workers and
+# swapped for newly published versions once they pass validation; warm_up() sets the poll interval and loads it
+model = ModelManager('power', lazy=True)
 
 @app.route('/input', methods=['POST','GET'])
 def input():
     return render_template('input_form.html')
 
+# Clients that prefer JSON over HTML get the prediction without a rendered page
+def wants_json():
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+# float() accepts 'nan' and 'inf', which the compiled models refuse to score
+def read_form_values(names):
+    values = [float(request.form[name]) for name in names]
+    for name, value in zip(names, values):
+        if not math.isfinite(value):
+            raise BatchInputError(f'{name} must be finite.')
+    return values
+
+def input_error(e):
+    if wants_json():
+        return jsonify(error=str(e)), 422
+    return f"An error occurred: {e}", 400
+
 @app.route('/predict', methods=['POST','GET'])
 def predict():
     try:
         # Receive form data
-        air_temperature = float(request.form['air_temperature'])
-        pressure = float(request.form['pressure'])
-        wind_speed = float(request.form['wind_speed'])
+        with stage('parse'):
+            try:
+                input_data = read_form_values(['air_temperature', 'pressure', 'wind_speed'])
+            except BatchInputError as e:
+                return input_error(e)
+            # e.g. Pressure in hPa instead of the normalized values the model was trained on
+            out_of_range = check_inputs(monitors['power'], [input_data], single=True,
+                                        reject=app.config['DRIFT_REJECT_OUT_OF_RANGE'])
 
         # Make predictions
-        input_data = np.array([[air_temperature, pressure, wind_speed]])
-        predicted_power_gen = model.predict(input_data)
+        with stage('predict'):
+            predicted_power_gen = power_cache.get_or_compute(input_data, predict_power)
+
+        if wants_json():
+            if out_of_range:
+                return jsonify(PowerGen=float(predicted_power_gen[0]), out_of_range=out_of_range)
+            return jsonify(PowerGen=float(predicted_power_gen[0]))
 
         # Render the prediction result template with the predicted power generation value
-        return render_template('prediction_result.html', predicted_power_gen=predicted_power_gen)
+        with stage('render'):
+            return render_template('prediction_result.html', predicted_power_gen=predicted_power_gen,
+                                   out_of_range=out_of_range)
     except Exception as e:
+        if wants_json():
+            return jsonify(error=str(e)), 400
         return f"An error occurred: {e}"
+
+# Batch input: JSON array of rows or a CSV upload with a DateTime column plus the feature columns
+def read_batch_input(columns):
+    if 'file' in request.files:
+        return read_weather_csv(request.files['file'].stream, columns)
+    if request.is_json:
+        return None, rows_from_json(request.get_json(), columns)
+    raise BatchInputError('Send a JSON array of rows or upload a CSV file as "file".')
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_route():
+    try:
+        with stage('parse'):
+            timestamps, input_data = read_batch_input(WEATHER_FEATURES)
+            out_of_range = check_inputs(monitors['power'], input_data, reject=app.config['DRIFT_REJECT_OUT_OF_RANGE'])
+    except BatchInputError as e:
+        return jsonify(error=str(e)), 400
+
+    with stage('predict'):
+        predicted_power_gen = predict_batch(model, input_data,
+                                            chunk_size=app.config['BATCH_CHUNK_SIZE'],
+                                            n_jobs=app.config['BATCH_N_JOBS'])
+
+    with stage('serialize'):
+        response = {'count': len(predicted_power_gen), 'PowerGen': predicted_power_gen.tolist()}
+        if timestamps is not None:
+            response['DateTime'] = timestamps
+        if out_of_range:
+            response['out_of_range'] = out_of_range
+        return jsonify(response)
 # Load the FinalPrediction model
-model1 = joblib.load('FinalPred.joblib')
+model1 = ModelManager('stability', lazy=True)
+
+# Concurrent single-row requests are scored together, one predict call per batch
+def build_batchers():
+    global power_batcher, stability_batcher
+    power_batcher = MicroBatcher(model.predict, app.config['MICRO_BATCH_MAX_SIZE'],
+                                 app.config['MICRO_BATCH_MAX_WAIT_MS'], name='power_gen')
+    stability_batcher = MicroBatcher(model1.predict, app.config['MICRO_BATCH_MAX_SIZE'],
+                                     app.config['MICRO_BATCH_MAX_WAIT_MS'], name='stability')
+
+@app.route('/batcher_stats')
+def batcher_stats():
+    return jsonify(power_gen=power_batcher.stats(), stability=stability_batcher.stats())
+
+def predict_power(row):
+    if app.config['MICRO_BATCHING']:
+        return power_batcher.predict(row)
+    return model.predict_one(row)
+
+def predict_stability(row):
+    if app.config['MICRO_BATCHING']:
+        return stability_batcher.predict(row)
+    return model1.predict_one(row)
+
+# Repeated inputs skip the forest; entries are dropped as soon as a new model version is active
+def build_caches():
+    global power_cache, stability_cache
+    power_cache = PredictionCache(app.config['PREDICTION_CACHE_SIZE'], app.config['PREDICTION_CACHE_TTL'],
+                                  app.config['POWER_CACHE_QUANTIZE'], app.config['PREDICTION_CACHE_MAX_BYTES'],
+                                  fingerprint=lambda: model.version, check_interval=0.0, name='power_gen')
+    stability_cache = PredictionCache(app.config['PREDICTION_CACHE_SIZE'], app.config['PREDICTION_CACHE_TTL'],
+                                      app.config['STABILITY_CACHE_QUANTIZE'], app.config['PREDICTION_CACHE_MAX_BYTES'],
+                                      fingerprint=lambda: model1.version, check_interval=0.0, name='stability')
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(power_gen=power_cache.stats(), stability=stability_cache.stats())
+
+# Input ranges and distributions compared against the training data; only counts are kept, never requests.
+# Filled in by warm_up()
+monitors = {}
+
+@app.route('/drift')
+def drift_report():
+    return jsonify({kind: monitor.report() for kind, monitor in monitors.items()})
+
+# Versioned JSON API for machine clients, sharing the caches, batchers and drift monitors of the HTML routes
+app.register_blueprint(create_api(model, model1,
+                                  lambda row: power_cache.get_or_compute(row, predict_power),
+                                  lambda row: stability_cache.get_or_compute(row, predict_stability),
+                                  monitors))
+
+# Model administration: status, reload the published version, roll back to the previous one
+managers = {'power': model, 'stability': model1}
+
+def admin_allowed():
+    token = app.config['ADMIN_TOKEN']
+    if token:
+        return request.headers.get('X-Admin-Token') == token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/models')
+def models_status():
+    if not admin_allowed():
+        return jsonify(error='Forbidden.'), 403
+    return jsonify({kind: manager.status() for kind, manager in managers.items()})
+
+@app.route('/admin/models/<kind>/<action>', methods=['POST'])
+def models_admin(kind, action):
+    if not admin_allowed():
+        return jsonify(error='Forbidden.'), 403
+    if kind not in managers or action not in ('reload', 'rollback'):
+        return jsonify(error='Unknown model or action.'), 404
+    manager = managers[kind]
+    try:
+        if action == 'reload':
+            manager.reload(force=request.args.get('force') == '1')
+        else:
+            manager.rollback()
+    except ModelRejected as e:
+        return jsonify(error=str(e), status=manager.status()), 409
+    return jsonify(manager.status())
+
+# Weather plus c1..c3, p1..p3 in, PowerGen, node splits and stability out, for a whole batch
+@app.route('/predict_pipeline', methods=['POST'])
+def predict_pipeline():
+    try:
+        with stage('parse'):
+            timestamps, input_data = read_batch_input(PIPELINE_FEATURES)
+            reject = app.config['DRIFT_REJECT_OUT_OF_RANGE']
+            out_of_range = check_inputs(monitors['power'], input_data[:, :len(WEATHER_FEATURES)], reject=reject)
+
+        with stage('predict'):
+            predictions = predict_grid(model, model1, input_data,
+                                       chunk_size=app.config['BATCH_CHUNK_SIZE'],
+                                       n_jobs=app.config['BATCH_N_JOBS'])
+            # The stability model's inputs: c1..p3 plus the PowerGen just predicted
+            grid_inputs = np.column_stack([input_data[:, len(WEATHER_FEATURES):], predictions['PowerGen']])
+            out_of_range = dict(out_of_range or {}, **(check_inputs(monitors['stability'], grid_inputs,
+                                                                   reject=reject) or {}))
+    except BatchInputError as e:
+        return jsonify(error=str(e)), 400
+
+    with stage('serialize'):
+        response = {name: values.tolist() for name, values in predictions.items()}
+        response['count'] = len(input_data)
+        if timestamps is not None:
+            response['DateTime'] = timestamps
+        if out_of_range:
+            response['out_of_range'] = out_of_range
+        return jsonify(response)
+
+# Historical generation data, e.g. /history?start=2019-03-01&end=2019-04-01&freq=daily
+history_store = TimeSeriesStore()
+
+@app.route('/history')
+def history():
+    try:
+        rows = history_store.history(request.args['start'], request.args['end'], request.args.get('freq', 'raw'))
+    except KeyError:
+        return jsonify(error='start and end are required.'), 400
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(count=len(rows), rows=rows)
+
+# Dashboard rollups, refreshed incrementally from the Data/ CSVs and revalidated by ETag
+rollup_store = RollupStore(refresh_interval=30.0)
+
+@app.route('/api/rollups')
+def rollups_api():
+    rollup_store.maybe_refresh()
+    try:
+        etag, body = rollup_store.rendered(request.args.get('period', 'daily'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route("/result", methods=["POST"])
 def predict_result():
     # Get input values from the form
-    c1 = float(request.form["c1"])
-    c2 = float(request.form["c2"])
-    c3 = float(request.form["c3"])
-    p1 = float(request.form["p1"])
-    p2 = float(request.form["p2"])
-    p3 = float(request.form["p3"])
-    PowerGen = float(request.form["PowerGen"])
+    with stage('parse'):
+        try:
+            c1, c2, c3, p1, p2, p3, PowerGen = read_form_values(["c1", "c2", "c3", "p1", "p2", "p3", "PowerGen"])
+        except BatchInputError as e:
+            return input_error(e)
+        try:
+            out_of_range = check_inputs(monitors['stability'], [[c1, c2, c3, p1, p2, p3, PowerGen]], single=True,
+                                        reject=app.config['DRIFT_REJECT_OUT_OF_RANGE'])
+        except BatchInputError as e:
+            if wants_json():
+                return jsonify(error=str(e)), 400
+            return f"An error occurred: {e}"
 
     # Calculate power_gen1, power_gen2, and power_gen3 based on PowerGen
     power_gen1 = PowerGen * 0.20
     power_gen2 = PowerGen * 0.45
     power_gen3 = PowerGen * 0.35
 
-    # Prepare input data for prediction
-    input_data = np.array([[c1, c2, c3, p1, p2, p3, PowerGen, power_gen1, power_gen2, power_gen3]])
-    
     # Make prediction using the trained model
-    predicted_stability = model1.predict(input_data)
+    input_data = [c1, c2, c3, p1, p2, p3, PowerGen, power_gen1, power_gen2, power_gen3]
+    with stage('predict'):
+        predicted_stability = stability_cache.get_or_compute(input_data, predict_stability)
 
     # Map predicted values to strings
     predicted_stability_label = "Stable" if predicted_stability[0] == 1 else "Unstable"
+    if wants_json():
+        response = dict(stability=predicted_stability_label, power_gen1=power_gen1, power_gen2=power_gen2,
+                        power_gen3=power_gen3)
+        if out_of_range:
+            response['out_of_range'] = out_of_range
+        return jsonify(response)
     
-    return render_template("result.html", predicted_stability=predicted_stability_label)
+    with stage('render'):
+        return render_template("result.html", predicted_stability=predicted_stability_label,
+                               out_of_range=out_of_range)
 
 @app.route('/check_smart_grid_stability', methods=['GET', 'POST'])
 def check_smart_grid_stability():
@@ -174,18 +511,27 @@ def sign_up():
             flash('Password must contain at least 8 characters, 1 capital letter, 1 small letter, and 1 symbol.', 'error')
             return redirect('/signup')
 
-        # Check if the username or email already exists
-        if User.query.filter_by(username=username).first() is not None:
+        # Check if the username or email already exists, in one indexed query
+        existing = db.session.query(User.username, User.email).filter(
+            or_(User.username == username, User.email == email)).limit(2).all()
+        if any(row.username == username for row in existing):
             flash('User already exists! Choose a different username.', 'error')
             return redirect('/signup')
-        elif User.query.filter_by(email=email).first() is not None:
+        elif existing:
             flash('Email already exists! Use a different email address.', 'error')
             return redirect('/signup')
 
         # If all validation passes, create a new user
-        new_user = User(firstName=firstName, lastName=lastName, username=username, email=email, password=password)
+        new_user = User(firstName=firstName, lastName=lastName, username=username, email=email,
+                        password=hasher.hash(password))
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent sign-up took the username or email after the check above
+            db.session.rollback()
+            flash('User already exists! Choose a different username.', 'error')
+            return redirect('/signup')
 
         flash('Registration successful. Now, user can sign in.', 'success')
         return redirect('/signin')
@@ -205,7 +551,14 @@ def sign_in():
 
         if user:
             # Check if the password matches
-            if user.password == password:
+            matches, needs_rehash = hasher.verify(user.password, password)
+            if matches:
+                if needs_rehash:
+                    user.password = hasher.hash(password)
+                    db.session.commit()
+                session.clear()
+                session['user_id'] = user.id
+                session['auth'] = hash_fingerprint(user.password)
                 flash('sign_in successful!', 'success')
                 return redirect('/home')
             else:
@@ -217,9 +570,14 @@ def sign_in():
 
     return render_template('signin.html')
 
+@app.route('/signout')
+def sign_out():
+    session.clear()
+    return redirect('/')
+
 @app.route('/proceed_to_check', methods=['GET','POST'])
 def proceed_to_check():
     return render_template('check_smart_grid_stability.html')
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,378 @@
+"""ASGI serving mode for the JSON prediction routes.
+
+Request handling runs on one asyncio event loop and model inference runs in
+a pool of worker processes, each holding its own ModelManager over the
+shared memory-mapped models, so predictions scale with cores instead of
+contending for the GIL. Concurrent single-row requests are coalesced into
+one batch per worker call; if such a batch fails, its rows are retried one
+by one so only the bad request fails. When more than max_pending requests
+are waiting for the pool, new ones get 503 with Retry-After instead of
+queueing without bound.
+
+Serves the JSON bodies of api.py's /api/v1/power (including ?quantiles) and
+/api/v1/stability, with the same validation and out_of_range flags, plus
+GET /healthz with pool statistics. CSV negotiation and X-Model-Version are
+left to the Flask app. Needs an ASGI server, e.g.:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+    python asgi.py --port 8000 --workers 4 --max-pending 256
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from api import STABILITY_INPUT, dumps, parse_quantiles, read_rows
+from batch_predict import WEATHER_FEATURES, BatchInputError
+from drift import DriftMonitor, check_inputs
+from pipeline import GRID_FEATURES, stability_features
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+GZIP_MIN_BYTES = 4096
+
+
+class Overloaded(Exception):
+    pass
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ********************************** Worker processes **********************************
+_worker_models = {}
+
+
+def _init_worker(poll_interval):
+    from model_manager import ModelManager
+
+    for kind in ('power', 'stability'):
+        _worker_models[kind] = ModelManager(kind, poll_interval=poll_interval)
+
+
+def _predict(kind, X):
+    return _worker_models[kind].predict(X)
+
+
+def _predict_quantiles(kind, X, quantiles):
+    return _worker_models[kind].predict_quantiles(X, quantiles)
+
+
+def _ready():
+    return os.getpid()
+
+
+# ********************************** Inference pool **********************************
+class _Coalescer:
+    """Collect single rows for up to max_wait seconds and score them in one pool call."""
+
+    def __init__(self, pool, kind, max_batch_size, max_wait):
+        self.pool = pool
+        self.kind = kind
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._rows = []
+        self._futures = []
+        self._timer = None
+        # Scoring tasks are only referenced here until they finish
+        self._tasks = set()
+
+    def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append(row)
+        self._futures.append(future)
+        if len(self._rows) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        if not rows:
+            return
+        task = asyncio.ensure_future(self._score(rows, futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, rows, futures):
+        try:
+            try:
+                predictions = await self.pool.run(self.kind, np.vstack(rows))
+            except Exception as e:
+                if len(rows) == 1:
+                    _settle(futures[0], error=e)
+                    return
+                # One bad row must not fail the requests it was coalesced with
+                for row, future in zip(rows, futures):
+                    try:
+                        _settle(future, await self.pool.run(self.kind, row[np.newaxis]))
+                    except Exception as e:
+                        _settle(future, error=e)
+                return
+            for i, future in enumerate(futures):
+                _settle(future, predictions[i:i + 1])
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _settle(future, result=None, error=None):
+    # The request may have gone away (and cancelled its future) while the batch was running
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferencePool:
+
+    def __init__(self, workers=None, max_pending=None, max_batch_size=64, max_wait_ms=1.0, poll_interval=10.0):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or 32 * self.workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.poll_interval = poll_interval
+        self.executor = None
+        self._coalescers = {}
+
+        self.pending = 0
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        # spawn: the event loop process may already run threads, which fork does not copy safely
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker, initargs=(self.poll_interval,))
+        # Load the models in every worker before taking traffic
+        for future in [self.executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        self._coalescers = {kind: _Coalescer(self, kind, self.max_batch_size, self.max_wait)
+                            for kind in ('power', 'stability')}
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def run(self, kind, X, quantiles=None):
+        self.batches += 1
+        self.rows += len(X)
+        loop = asyncio.get_running_loop()
+        if quantiles is not None:
+            return await loop.run_in_executor(self.executor, _predict_quantiles, kind, X, quantiles)
+        return await loop.run_in_executor(self.executor, _predict, kind, X)
+
+    async def predict(self, kind, X, quantiles=None):
+        """Score X in the pool (mean, std and quantiles across trees when quantiles are given).
+
+        Raises Overloaded when max_pending requests are already waiting.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        self.pending += 1
+        self.requests += 1
+        try:
+            if len(X) == 1 and quantiles is None and self.max_batch_size > 1:
+                return await self._coalescers[kind].submit(X[0])
+            return await self.run(kind, X, quantiles)
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+        }
+
+
+# ********************************** ASGI application **********************************
+class PredictionApp:
+
+    def __init__(self, pool, drift=True, reject_out_of_range=False):
+        """drift loads the drift.DriftMonitor reference profiles at startup to flag (or reject) out-of-range inputs."""
+        self.pool = pool
+        self.drift = drift
+        self.reject_out_of_range = reject_out_of_range
+        self.monitors = {}
+        self.routes = {
+            ('POST', '/api/v1/power'): self.power,
+            ('POST', '/api/v1/stability'): self.stability,
+            ('GET', '/healthz'): self.health,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        started = time.perf_counter()
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            known = any(path == scope['path'] for _, path in self.routes)
+            status, payload = (405, 'Method not allowed.') if known else (404, 'Not found.')
+            return await self.respond(send, scope, status, {'error': payload, 'status': status})
+        try:
+            status, payload = await handler(scope, receive)
+        except Overloaded:
+            status, payload = 503, {'error': 'Inference queue is full, retry shortly.', 'status': 503}
+            return await self.respond(send, scope, status, payload, [(b'retry-after', b'1')])
+        except BatchInputError as e:
+            status, payload = 422, {'error': str(e), 'status': 422}
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e), 'status': e.status}
+        headers = [(b'server-timing', f'app;dur={(time.perf_counter() - started) * 1000:.2f}'.encode())]
+        if payload.get('out_of_range'):
+            headers.append((b'x-input-out-of-range', ','.join(payload['out_of_range']).encode()))
+        await self.respond(send, scope, status, payload, headers)
+
+    def start(self):
+        self.pool.start()
+        if self.drift:
+            self.monitors = {kind: DriftMonitor.from_csv(kind) for kind in ('power', 'stability')}
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.start)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ********************************** Routes **********************************
+    def check_ranges(self, kind, X, single):
+        return check_inputs(self.monitors.get(kind), X, single, self.reject_out_of_range)
+
+    async def power(self, scope, receive):
+        X, single = read_rows(await self.read_json(scope, receive), WEATHER_FEATURES)
+        quantiles = parse_quantiles(parse_qs(scope.get('query_string', b'').decode(),
+                                             keep_blank_values=True).get('quantiles', [None])[0])
+        flagged = self.check_ranges('power', X, single)
+        if quantiles is not None:
+            summary = await self.pool.predict('power', X, quantiles)
+            columns = {'PowerGen' if name == 'mean' else name: values for name, values in summary.items()}
+        else:
+            columns = {'PowerGen': await self.pool.predict('power', X)}
+        return 200, self.body(columns, single, flagged)
+
+    async def stability(self, scope, receive):
+        X, single = read_rows(await self.read_json(scope, receive), STABILITY_INPUT)
+        flagged = self.check_ranges('stability', X, single)
+        features = stability_features(X[:, :len(GRID_FEATURES)], X[:, len(GRID_FEATURES)])
+        labels = await self.pool.predict('stability', features)
+        columns = {
+            'stability': np.where(np.asarray(labels) == 1, 'Stable', 'Unstable').tolist(),
+            'power_gen1': features[:, 7],
+            'power_gen2': features[:, 8],
+            'power_gen3': features[:, 9],
+        }
+        return 200, self.body(columns, single, flagged)
+
+    @staticmethod
+    def body(columns, single, flagged):
+        if single:
+            payload = {name: values[0] if name == 'stability' else float(values[0])
+                       for name, values in columns.items()}
+        else:
+            payload = dict(columns, count=len(next(iter(columns.values()))))
+        if flagged:
+            payload['out_of_range'] = flagged
+        return payload
+
+    async def health(self, scope, receive):
+        return 200, self.pool.stats()
+
+    # ********************************** HTTP helpers **********************************
+    async def read_json(self, scope, receive):
+        headers = dict(scope['headers'])
+        if not headers.get(b'content-type', b'').startswith(b'application/json'):
+            raise HTTPError(415, 'Send application/json.')
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                raise HTTPError(413, 'Request body is too large.')
+            if not message.get('more_body'):
+                break
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise HTTPError(400, 'Request body is not valid JSON.')
+
+    async def respond(self, send, scope, status, payload, extra_headers=()):
+        body = dumps(payload)
+        headers = [(b'content-type', b'application/json'), (b'vary', b'accept-encoding'), *extra_headers]
+        if len(body) >= GZIP_MIN_BYTES and b'gzip' in dict(scope['headers']).get(b'accept-encoding', b''):
+            body = gzip.compress(body, 5)
+            headers.append((b'content-encoding', b'gzip'))
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+app = PredictionApp(InferencePool(workers=env_int('SUSTAINAWATT_INFERENCE_WORKERS'),
+                                  max_pending=env_int('SUSTAINAWATT_MAX_PENDING')),
+                    reject_out_of_range=bool(env_int('SUSTAINAWATT_REJECT_OUT_OF_RANGE')))
+
+
+# ********************************** Command line **********************************
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the JSON prediction API over ASGI.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help='inference processes (default: all cores)')
+    parser.add_argument('--max-pending', type=int, help='requests waiting for the pool before 503s')
+    parser.add_argument('--reject-out-of-range', action='store_true',
+                        help='answer 422 instead of flagging inputs outside the training data range')
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('The ASGI mode needs an ASGI server: pip install uvicorn')
+
+    uvicorn.run(PredictionApp(InferencePool(args.workers, args.max_pending),
+                              reject_out_of_range=args.reject_out_of_range),
+                host=args.host, port=args.port, lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
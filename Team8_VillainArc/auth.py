@@ -0,0 +1,110 @@
+"""Password hashing and signed-in session validation.
+
+Passwords are stored as salted werkzeug hashes whose method string sets the
+cost, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'. Hashing runs in
+the request thread; hashlib releases the GIL while it works, so other
+requests keep being served. A semaphore bounds how many CPU-heavy hashes run
+at once, so a burst of sign-ins queues for the cores instead of slowing every
+hash (and every other request) down together. Rows still holding a plaintext
+password, or a hash made with an older method, are upgraded the next time
+that user signs in.
+
+Signed-in sessions carry the user id and a short fingerprint of the password
+hash; SessionCache remembers recent validations so a logged-in request only
+reaches the database once per ttl seconds.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+# Prefixes of werkzeug hashes; anything else is a legacy plaintext password
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES)
+
+
+def hash_fingerprint(stored):
+    # Changes whenever the password does, so a password change signs other sessions out
+    return hashlib.sha256(stored.encode()).hexdigest()[:16]
+
+
+class PasswordHasher:
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=None):
+        """workers caps the hashes computed at once (default: one per core)."""
+        self.method = method
+        self._slots = threading.BoundedSemaphore(workers or os.cpu_count())
+
+    def hash(self, password):
+        with self._slots:
+            return generate_password_hash(password, self.method)
+
+    def verify(self, stored, password):
+        """(matches, needs_rehash) for a stored hash or legacy plaintext value."""
+        if not is_hashed(stored):
+            return hmac.compare_digest(stored.encode(), password.encode()), True
+        with self._slots:
+            matches = check_password_hash(stored, password)
+        return matches, matches and not stored.startswith(self.method + '$')
+
+
+class SessionCache:
+    """Thread-safe TTL cache of validated (user id, hash fingerprint) pairs."""
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0}
+
+
+def validate_session(session, cache, load_fingerprint):
+    """Username of the signed-in user, or None; load_fingerprint(user_id) -> (username, fingerprint) or None."""
+    user_id = session.get('user_id')
+    fingerprint = session.get('auth')
+    if user_id is None or fingerprint is None:
+        return None
+    key = (user_id, fingerprint)
+    username = cache.get(key)
+    if username is None:
+        row = load_fingerprint(user_id)
+        if row is None or row[1] != fingerprint:
+            session.clear()
+            return None
+        username = row[0]
+        cache.put(key, username)
+    return username
@@ -0,0 +1,149 @@
+import csv
+import io
+import math
+
+import numpy as np
+
+# Column layout of wind_power_gen_*_data.csv
+WEATHER_FEATURES = ['AirTemp', 'Pressure', 'WindSpeed']
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class BatchInputError(ValueError):
+    pass
+
+
+# ********************************** Input parsing **********************************
+def first_non_finite(X):
+    """Index of the first row holding NaN or infinity (which the models cannot score), else None."""
+    bad = ~np.isfinite(X).all(axis=1)
+    return int(np.argmax(bad)) if bad.any() else None
+
+
+def rows_from_json(payload, columns=WEATHER_FEATURES):
+    """Build an (n, len(columns)) float matrix from a JSON batch.
+
+    Accepts either a list of objects keyed by the column names (AirTemp,
+    Pressure, WindSpeed by default) or a list of value lists in column order,
+    optionally wrapped as {"rows": [...]}.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list) or not payload:
+        raise BatchInputError('Expected a non-empty JSON array of rows.')
+
+    X = np.empty((len(payload), len(columns)), dtype=np.float64)
+    for i, row in enumerate(payload):
+        try:
+            if isinstance(row, dict):
+                X[i] = [float(row[name]) for name in columns]
+            else:
+                if len(row) != len(columns):
+                    raise ValueError
+                X[i] = [float(value) for value in row]
+        except (KeyError, TypeError, ValueError):
+            raise BatchInputError(f'Row {i} must provide numeric {", ".join(columns)}.')
+    bad = first_non_finite(X)
+    if bad is not None:
+        raise BatchInputError(f'Row {bad} must provide finite {", ".join(columns)}.')
+    return X
+
+
+def _text_stream(stream):
+    if isinstance(stream, (bytes, bytearray)):
+        return io.StringIO(stream.decode('utf-8-sig'))
+    if not isinstance(stream, io.TextIOBase):
+        return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return stream
+
+
+def iter_weather_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE, columns=WEATHER_FEATURES):
+    """Yield (DateTime values or None, feature matrix) chunks of a weather CSV.
+
+    Only chunk_size rows are held at a time, so arbitrarily large files can be
+    scored in bounded memory. Extra columns such as PowerGen are ignored.
+    """
+    reader = csv.reader(_text_stream(stream))
+    header = next(reader, None)
+    if header is None:
+        raise BatchInputError('The uploaded CSV is empty.')
+    header = [name.strip() for name in header]
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise BatchInputError(f'The uploaded CSV is missing column(s): {", ".join(missing)}.')
+
+    columns = [header.index(name) for name in columns]
+    time_column = header.index('DateTime') if 'DateTime' in header else None
+
+    timestamps = []
+    values = []
+    for line_number, record in enumerate(reader, start=2):
+        if not record:
+            continue
+        try:
+            row = [float(record[c]) for c in columns]
+        except (IndexError, ValueError):
+            raise BatchInputError(f'Line {line_number} of the uploaded CSV is not numeric.')
+        if not all(map(math.isfinite, row)):
+            raise BatchInputError(f'Line {line_number} of the uploaded CSV is not finite.')
+        values.append(row)
+        if time_column is not None:
+            timestamps.append(record[time_column])
+        if len(values) == chunk_size:
+            yield (timestamps if time_column is not None else None), np.asarray(values, dtype=np.float64)
+            timestamps = []
+            values = []
+
+    if values:
+        yield (timestamps if time_column is not None else None), np.asarray(values, dtype=np.float64)
+
+
+def read_weather_csv(stream, columns=WEATHER_FEATURES):
+    """Parse a whole DateTime,AirTemp,Pressure,WindSpeed CSV.
+
+    Returns the DateTime column (or None when absent) and the feature matrix.
+    """
+    chunks = list(iter_weather_chunks(stream, columns=columns))
+    if not chunks:
+        raise BatchInputError('The uploaded CSV has no data rows.')
+    timestamps = None
+    if chunks[0][0] is not None:
+        timestamps = [value for chunk_timestamps, _ in chunks for value in chunk_timestamps]
+    return timestamps, np.concatenate([X for _, X in chunks])
+
+
+# ********************************** Batch inference **********************************
+def iter_chunks(X, chunk_size):
+    for start in range(0, X.shape[0], chunk_size):
+        yield X[start:start + chunk_size]
+
+
+def predict_batch(model, X, chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=None):
+    """Score every row of X, calling model.predict once per chunk.
+
+    Chunks are scored in parallel threads when n_jobs is set; the output keeps
+    the input row order.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if X.shape[0] == 0:
+        return np.empty(0, dtype=np.float64)
+    chunk_size = max(1, int(chunk_size or DEFAULT_CHUNK_SIZE))
+
+    if n_jobs in (None, 0, 1) or X.shape[0] <= chunk_size:
+        parts = [model.predict(chunk) for chunk in iter_chunks(X, chunk_size)]
+    else:
+        # Tree traversal releases the GIL, so threads avoid copying the forest into subprocesses
+        from joblib import Parallel, delayed
+
+        parts = Parallel(n_jobs=n_jobs, prefer='threads')(
+            delayed(model.predict)(chunk) for chunk in iter_chunks(X, chunk_size))
+    return np.concatenate(parts)
+
+
+def predict_quantiles_batch(model, X, quantiles, chunk_size=DEFAULT_CHUNK_SIZE):
+    """model.predict_quantiles over X chunk by chunk; returns the same dict of arrays."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    chunk_size = max(1, int(chunk_size or DEFAULT_CHUNK_SIZE))
+    parts = [model.predict_quantiles(chunk, quantiles) for chunk in iter_chunks(X, chunk_size)]
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
@@ -0,0 +1,91 @@
+"""CPU time per request: HTML form routes versus the /api/v1 JSON endpoints.
+
+Replays validation CSV rows one request at a time through /predict and
+/result (rendered pages) and through /api/v1/power and /api/v1/stability,
+measuring process CPU time rather than wall time. The prediction caches are
+disabled so both paths reach the model. Also reports the size and encode
+time of a large batch response with and without gzip.
+
+Run from Team8_VillainArc (needs both model files):
+    python benchmarks/bench_api.py --requests 2000
+"""
+import argparse
+import csv
+import gzip
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(ROOT), 'Data')
+sys.path.insert(0, ROOT)
+
+
+def load_rows(path, columns, limit):
+    with open(path, newline='') as f:
+        rows = [{name: float(record[name]) for name in columns} for record in csv.DictReader(f)]
+    return rows[:limit]
+
+
+def cpu_per_request(send, payloads):
+    start = time.process_time()
+    for payload in payloads:
+        send(payload)
+    return (time.process_time() - start) / len(payloads) * 1e6
+
+
+def run(args):
+    import app1
+    from api import dumps
+
+    # The HTML routes and the API share the prediction caches; ttl=0 turns them off so every request reaches the model
+    app1.create_app({'PREDICTION_CACHE_TTL': 0})
+    client = app1.app.test_client()
+
+    weather = load_rows(os.path.join(DATA_DIR, 'wind_power_gen_3months_validation_data.csv'),
+                        ['AirTemp', 'Pressure', 'WindSpeed'], args.requests)
+    grid = load_rows(os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+                     ['c1', 'c2', 'c3', 'p1', 'p2', 'p3', 'PowerGen'], args.requests)
+    forms = [{'air_temperature': r['AirTemp'], 'pressure': r['Pressure'], 'wind_speed': r['WindSpeed']}
+             for r in weather]
+
+    cases = [
+        ('/predict (HTML)', lambda form: client.post('/predict', data=form), forms),
+        ('/api/v1/power', lambda row: client.post('/api/v1/power', json=row), weather),
+        ('/result (HTML)', lambda row: client.post('/result', data=row), grid),
+        ('/api/v1/stability', lambda row: client.post('/api/v1/stability', json=row), grid),
+    ]
+    print(f'{"":<22}{"CPU us/request":>16}')
+    for name, send, payloads in cases:
+        send(payloads[0])
+        print(f'{name:<22}{cpu_per_request(send, payloads):16.0f}')
+
+    rows = [[r['AirTemp'], r['Pressure'], r['WindSpeed']] for r in weather]
+    rows = (rows * (args.batch_rows // len(rows) + 1))[:args.batch_rows]
+    predictions = app1.model.predict(rows)
+    start = time.perf_counter()
+    body = dumps({'PowerGen': predictions, 'count': len(predictions)})
+    encode_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    compressed = gzip.compress(body, app1.app.config['API_GZIP_LEVEL'])
+    gzip_ms = (time.perf_counter() - start) * 1000
+    print(f'\n{args.batch_rows}-row batch response: {len(body) / 1024:.0f} KiB JSON in {encode_ms:.1f} ms, '
+          f'{len(compressed) / 1024:.0f} KiB gzipped in {gzip_ms:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--batch-rows', type=int, default=50000)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SUSTAINAWATT_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Throughput of the ASGI prediction app by inference pool size.
+
+Calls asgi.PredictionApp in-process (no HTTP server needed) with
+--concurrency asyncio clients, each sending single-row /api/v1/power
+requests back to back, for every --workers value. A final burst of
+--burst simultaneous requests against a small --max-pending shows how many
+are shed with 503 instead of queueing.
+
+Run from Team8_VillainArc (needs both model files):
+    python benchmarks/bench_asgi.py --workers 1,2,4 --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(ROOT), 'Data')
+sys.path.insert(0, ROOT)
+
+from asgi import InferencePool, PredictionApp
+from batch_predict import read_weather_csv
+
+
+async def call(app, body):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/v1/power',
+             'headers': [(b'content-type', b'application/json')]}
+    await app(scope, receive, send)
+    return sent[0]['status']
+
+
+async def drive(app, bodies, concurrency):
+    latencies = []
+    statuses = Counter()
+    queue = iter(bodies)
+
+    async def client():
+        for body in queue:
+            started = time.perf_counter()
+            statuses[await call(app, body)] += 1
+            latencies.append(time.perf_counter() - started)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return len(bodies) / (time.perf_counter() - start), np.asarray(latencies) * 1000.0, statuses
+
+
+async def run(args, bodies):
+    print(f'{"workers":>8}{"req/s":>10}{"p50 ms":>9}{"p99 ms":>9}{"batch":>8}  statuses')
+    for workers in [int(w) for w in args.workers.split(',')]:
+        pool = InferencePool(workers, max_pending=args.concurrency, max_batch_size=args.max_batch_size)
+        pool.start()
+        app = PredictionApp(pool)
+        await drive(app, bodies[:200], args.concurrency)
+        rate, latencies, statuses = await drive(app, bodies[:args.requests], args.concurrency)
+        stats = pool.stats()
+        print(f'{workers:8d}{rate:10.0f}{np.percentile(latencies, 50):9.2f}{np.percentile(latencies, 99):9.2f}'
+              f'{stats["mean_batch_size"]:8.1f}  {dict(statuses)}')
+        pool.close()
+
+    pool = InferencePool(1, max_pending=args.max_pending, max_batch_size=args.max_batch_size)
+    pool.start()
+    statuses = Counter(await asyncio.gather(*(call(PredictionApp(pool), body) for body in bodies[:args.burst])))
+    pool.close()
+    print(f'\nburst of {args.burst} with max_pending={args.max_pending}: {dict(statuses)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--burst', type=int, default=2000)
+    parser.add_argument('--max-pending', type=int, default=256)
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, 'wind_power_gen_3months_validation_data.csv'), newline='') as f:
+        _, X = read_weather_csv(f)
+    X = np.tile(X, (max(args.requests, args.burst) // len(X) + 1, 1))
+    bodies = [json.dumps({'AirTemp': a, 'Pressure': p, 'WindSpeed': w}).encode() for a, p, w in X.tolist()]
+    print(f'{os.cpu_count()} CPU(s), {args.concurrency} concurrent clients, single-row requests')
+    asyncio.run(run(args, bodies))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Sign-in throughput by password hash cost, and cached session validation.
+
+Creates --users accounts hashed with each method in --methods, then signs
+them in from --threads concurrent test clients. Afterwards a signed-in
+client requests /home repeatedly with the session cache on and off (TTL 0)
+to show what skipping the per-request user lookup saves.
+
+Run from Team8_VillainArc (needs both model files):
+    python benchmarks/bench_auth.py --methods pbkdf2:sha256:600000,pbkdf2:sha256:100000,scrypt:32768:8:1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'Bench@123'
+
+
+def sign_in_rate(app1, method, prefix, users, threads):
+    app1.hasher.method = method
+    with app1.app.app_context():
+        stored = app1.hasher.hash(PASSWORD)
+        # Same hash for every account: only sign-in is being timed
+        app1.db.session.add_all(app1.User(firstName='Bench', lastName='User', username=f'{prefix}{i:05d}',
+                                          email=f'{prefix}{i}@gmail.com', password=stored) for i in range(users))
+        app1.db.session.commit()
+
+    def sign_in(i):
+        client = app1.app.test_client()
+        return client.post('/signin', data={'username': f'{prefix}{i:05d}', 'password': PASSWORD}).headers['Location']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        locations = list(pool.map(sign_in, range(users)))
+    return users / (time.perf_counter() - start), locations.count('/home')
+
+
+def validation_rate(app1, requests):
+    with app1.app.app_context():
+        username = app1.db.session.query(app1.User.username).first().username
+    client = app1.app.test_client()
+    client.post('/signin', data={'username': username, 'password': PASSWORD})
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/home')
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default='pbkdf2:sha256:600000,pbkdf2:sha256:100000,scrypt:32768:8:1')
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--requests', type=int, default=2000, help='signed-in /home requests')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SUSTAINAWATT_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        import app1
+
+        app1.create_app()
+        print(f'{"hash method":<26}{"sign-ins/s":>12}{"ms each":>10}  ({args.threads} threads)')
+        for n, method in enumerate(args.methods.split(',')):
+            rate, ok = sign_in_rate(app1, method, f'bench{n}_', args.users, args.threads)
+            print(f'{method:<26}{rate:12.1f}{1000 / rate:10.1f}  {ok}/{args.users} signed in')
+
+        cached = validation_rate(app1, args.requests)
+        app1.session_cache.ttl = 0
+        uncached = validation_rate(app1, args.requests)
+        print(f'\nsigned-in /home: {cached:.0f} req/s with the session cache, {uncached:.0f} req/s without')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compare single-row /predict scoring with batch_predict on the validation CSV.
+
+Run from Team8_VillainArc:
+    python benchmarks/bench_batch_predict.py --chunk-sizes 256 1024 4096 --n-jobs 1 4
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch_predict import predict_batch, read_weather_csv
+
+
+def single_row_rate(model, X):
+    start = time.perf_counter()
+    for air_temperature, pressure, wind_speed in X:
+        model.predict(np.array([[air_temperature, pressure, wind_speed]]))
+    return len(X) / (time.perf_counter() - start)
+
+
+def batch_rate(model, X, chunk_size, n_jobs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_batch(model, X, chunk_size=chunk_size, n_jobs=n_jobs)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(ROOT, 'final_power_gen_model.joblib'))
+    parser.add_argument('--data', default=os.path.join(ROOT, 'wind_power_gen_3months_validation_data.csv'))
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[256, 1024, 4096])
+    parser.add_argument('--n-jobs', type=int, nargs='+', default=[1, -1])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # The notebook fits on a DataFrame; scoring plain arrays is intended here
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    model = joblib.load(args.model)
+    with open(args.data, newline='') as f:
+        _, X = read_weather_csv(f)
+
+    # Results must match the single-row path exactly, in the same order
+    expected = np.concatenate([model.predict(X[i:i + 1]) for i in range(len(X))])
+    assert np.array_equal(expected, predict_batch(model, X, chunk_size=97, n_jobs=2))
+
+    baseline = single_row_rate(model, X)
+    print(f'{len(X)} rows from {args.data}')
+    print(f'{"path":<32}{"rows/sec":>12}{"speedup":>10}')
+    print(f'{"single-row model.predict":<32}{baseline:>12.0f}{1.0:>9.1f}x')
+    for n_jobs in args.n_jobs:
+        for chunk_size in args.chunk_sizes:
+            rate = batch_rate(model, X, chunk_size, n_jobs, args.repeat)
+            label = f'batch chunk={chunk_size} n_jobs={n_jobs}'
+            print(f'{label:<32}{rate:>12.0f}{rate / baseline:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
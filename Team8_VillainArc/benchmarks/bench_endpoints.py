@@ -0,0 +1,277 @@
+"""Latency, throughput and memory of the app1.py HTML endpoints.
+
+Replays rows from the Data/ validation CSVs through /predict, /result,
+/signin and /signup, first with the Flask test client and then over HTTP
+against a threaded local WSGI server, each with --concurrency client
+threads. Every run uses a fresh SQLite database. Results (p50/p95/p99,
+throughput, status codes, RSS) are written as JSON; --compare checks them
+against an earlier file and exits non-zero when p95 latency or throughput
+regressed by more than --threshold. Scenarios that answered with errors are
+reported but not compared. /check_smart_grid_stability, which currently
+always fails, can still be run with --scenarios.
+
+Run from Team8_VillainArc (needs both model files):
+    python benchmarks/bench_endpoints.py --requests 1000 --concurrency 8 --output bench.json
+    python benchmarks/bench_endpoints.py --output new.json --compare bench.json
+"""
+import argparse
+import csv
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(ROOT), 'Data')
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ['predict', 'result', 'signin', 'signup']
+PASSWORD = 'Bench@123'
+
+
+# ********************************** Request payloads **********************************
+def load_rows(path, columns):
+    with open(path, newline='') as f:
+        return [{name: record[name] for name in columns} for record in csv.DictReader(f)]
+
+
+def build_payloads(run_id, offset=0):
+    """scenario -> function(i) returning the form for the i-th request, counted from row offset."""
+    weather = load_rows(os.path.join(DATA_DIR, 'wind_power_gen_3months_validation_data.csv'),
+                        ['AirTemp', 'Pressure', 'WindSpeed'])
+    grid = load_rows(os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+                     ['c1', 'c2', 'c3', 'p1', 'p2', 'p3', 'PowerGen'])
+
+    def predict(i):
+        row = weather[(offset + i) % len(weather)]
+        return {'air_temperature': row['AirTemp'], 'pressure': row['Pressure'], 'wind_speed': row['WindSpeed']}
+
+    def signup(i):
+        return {'firstname': 'Bench', 'lastname': 'User', 'username': f'{run_id}_new{i:07d}',
+                'email': f'{run_id}.new{i}@gmail.com', 'password': PASSWORD}
+
+    return {
+        'predict': predict,
+        'result': lambda i: grid[(offset + i) % len(grid)],
+        'check_smart_grid_stability': lambda i: grid[(offset + i) % len(grid)],
+        'signin': lambda i: {'username': f'bench_user{i % 100:04d}', 'password': PASSWORD},
+        'signup': signup,
+    }
+
+
+def create_users(app1, count=100):
+    # Hashed like /signup would, so /signin never takes the plaintext-and-rehash path; one hash serves every user
+    stored = app1.hasher.hash(PASSWORD)
+    with app1.app.app_context():
+        for i in range(count):
+            app1.db.session.add(app1.User(firstName='Bench', lastName='User', username=f'bench_user{i:04d}',
+                                          email=f'bench_user{i}@gmail.com', password=stored))
+        app1.db.session.commit()
+
+
+# ********************************** Drivers **********************************
+def test_client_sender(app):
+    local = threading.local()
+
+    def send(path, form):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.post(path, data=form).status_code
+    return send
+
+
+def http_sender(host, port):
+    local = threading.local()
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+    def send(path, form):
+        # One keep-alive connection per client thread
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            conn.request('POST', path, urlencode(form), headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            local.conn = None
+            conn.close()
+            return 0
+    return send
+
+
+def start_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(send, path, payload, requests, concurrency, warmup):
+    for i in range(warmup):
+        send(path, payload(i))
+
+    counter = itertools.count(warmup)
+    latencies = np.empty(requests, dtype=np.float64)
+    statuses = {}
+    lock = threading.Lock()
+
+    def client(slot_ids):
+        for slot in slot_ids:
+            form = payload(next(counter))
+            started = time.perf_counter()
+            status = send(path, form)
+            latencies[slot] = time.perf_counter() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    slots = np.array_split(np.arange(requests), concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(client, slots))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000.0
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': requests / elapsed,
+        'latency_ms': {'mean': latencies.mean() * 1000.0, 'p50': p50, 'p95': p95, 'p99': p99,
+                       'max': latencies.max() * 1000.0},
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'rss_mb': rss_mb(),
+    }
+
+
+# ********************************** Results **********************************
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def succeeded(result):
+    return all(200 <= int(status) < 400 for status in result['statuses'])
+
+
+def compare(baseline, current, threshold):
+    """Print per-scenario deltas; returns the names that regressed beyond threshold."""
+    regressions = []
+    print(f'\n{"vs " + str(baseline.get("commit")):<42}{"p95 ms":>18}{"req/s":>22}')
+    for key, result in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        # Timings of error responses say nothing about the endpoint
+        if not (succeeded(result) and succeeded(before)):
+            print(f'{key:<42}{"skipped: not all 2xx/3xx":>40}')
+            continue
+        p95_change = result['latency_ms']['p95'] / before['latency_ms']['p95'] - 1.0
+        rps_change = result['throughput_rps'] / before['throughput_rps'] - 1.0
+        regressed = p95_change > threshold or rps_change < -threshold
+        if regressed:
+            regressions.append(key)
+        print(f'{key:<42}{result["latency_ms"]["p95"]:9.2f} ({p95_change:+6.1%}){result["throughput_rps"]:12.0f} '
+              f'({rps_change:+6.1%}){"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000, help='timed requests per scenario and mode')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--modes', default='client,server', help='comma-separated: client, server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative regression')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SUSTAINAWATT_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        import app1
+
+        # Every request should reach the model; the cache is measured by its own stats
+        app1.create_app({'PREDICTION_CACHE_TTL': 0})
+        app1.app.logger.disabled = True
+        create_users(app1)
+
+        results = {}
+        print(f'{"":<42}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}  statuses')
+        for n, mode in enumerate(args.modes.split(',')):
+            server = None
+            if mode == 'server':
+                server = start_server(app1.app)
+                send = http_sender('127.0.0.1', server.server_port)
+            else:
+                send = test_client_sender(app1.app)
+            # Each mode replays rows the previous ones did not send
+            payloads = build_payloads(f'{mode}{int(time.time())}', n * (args.warmup + args.requests))
+            for scenario in args.scenarios.split(','):
+                result = run_scenario(send, f'/{scenario}', payloads[scenario], args.requests,
+                                      args.concurrency, args.warmup)
+                key = f'{mode}:/{scenario}'
+                results[key] = result
+                latency = result['latency_ms']
+                print(f'{key:<42}{latency["p50"]:9.2f}{latency["p95"]:9.2f}{latency["p99"]:9.2f}'
+                      f'{result["throughput_rps"]:9.0f}  {result["statuses"]}')
+            if server is not None:
+                server.shutdown()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'peak_rss_mb': peak_rss_mb(),
+        'config': {'requests': args.requests, 'concurrency': args.concurrency, 'warmup': args.warmup},
+        'results': results,
+    }
+    print(f'peak RSS {report["peak_rss_mb"]:.0f} MB')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            raise SystemExit(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Single-row latency and batch throughput of FlatForest versus scikit-learn.
+
+Run from Team8_VillainArc:
+    python benchmarks/bench_flat_forest.py --rows 500
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flat_forest import FlatForest, read_columns
+
+
+def per_row_us(predict, X):
+    start = time.perf_counter()
+    for row in X:
+        predict(row)
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+
+def batch_rows_per_sec(predict, X, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(ROOT, 'final_power_gen_model.joblib'))
+    parser.add_argument('--data', default=os.path.join(ROOT, 'wind_power_gen_3months_validation_data.csv'))
+    parser.add_argument('--rows', type=int, default=500, help='rows used for the single-row timing')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    model = joblib.load(args.model)
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(model)
+    convert_s = time.perf_counter() - start
+    X = read_columns(args.data, ['AirTemp', 'Pressure', 'WindSpeed'])
+    sample = X[:args.rows]
+
+    sklearn_us = per_row_us(lambda row: model.predict(np.array([row])), sample)
+    flat_us = per_row_us(forest.predict_one, sample)
+    print(f'converted {forest.n_trees} trees / {forest.n_nodes} nodes in {convert_s:.2f}s')
+    print(f'single row   sklearn {sklearn_us:10.1f} us   flat {flat_us:10.1f} us   {sklearn_us / flat_us:6.1f}x')
+
+    sklearn_rate = batch_rows_per_sec(model.predict, X)
+    flat_rate = batch_rows_per_sec(forest.predict, X)
+    print(f'batch {len(X)}   sklearn {sklearn_rate:8.0f} rows/s   flat {flat_rate:8.0f} rows/s   {flat_rate / sklearn_rate:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
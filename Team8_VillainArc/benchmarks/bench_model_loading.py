@@ -0,0 +1,92 @@
+"""Per-worker RSS/PSS and cold-start time: private joblib.load versus the mmap registry.
+
+Forks --workers processes like a prefork server and has each one load the
+model, score one row and report its memory while all workers are alive.
+PSS splits shared pages between the processes mapping them, so it shows
+what each worker really costs.
+
+Run from Team8_VillainArc:
+    python benchmarks/bench_model_loading.py --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_registry import ModelRegistry
+
+
+def memory_kb():
+    usage = {}
+    for status_file, keys in (('/proc/self/status', ('VmRSS',)), ('/proc/self/smaps_rollup', ('Pss',))):
+        try:
+            with open(status_file) as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if name in keys:
+                        usage[name] = int(value.split()[0])
+        except OSError:
+            pass
+    return usage
+
+
+def worker(mode, path, cache_dir, barrier, results):
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    start = time.perf_counter()
+    if mode == 'joblib':
+        model = joblib.load(path)
+    else:
+        model = ModelRegistry(cache_dir).get(path)
+    load_s = time.perf_counter() - start
+    model.predict(np.array([[6.609, 0.988077, 10.868]]))
+
+    barrier.wait()
+    results.put((mode, load_s, memory_kb()))
+    barrier.wait()
+
+
+def run(mode, path, cache_dir, workers):
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, path, cache_dir, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(ROOT, 'final_power_gen_model.joblib'))
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Export once up front, as the first worker of a deployment would
+        start = time.perf_counter()
+        ModelRegistry(cache_dir).get(args.model)
+        print(f'one-time export to mmap cache: {time.perf_counter() - start:.2f}s')
+
+        print(f'{"mode":<10}{"cold start s":>14}{"RSS MB":>10}{"PSS MB":>10}')
+        for mode in ('joblib', 'registry'):
+            reports = run(mode, args.model, cache_dir, args.workers)
+            load_s = sum(r[1] for r in reports) / len(reports)
+            rss = sum(r[2].get('VmRSS', 0) for r in reports) / len(reports) / 1024
+            pss = sum(r[2].get('Pss', 0) for r in reports) / len(reports) / 1024
+            print(f'{mode:<10}{load_s:>14.3f}{rss:>10.1f}{pss:>10.1f}   (mean of {len(reports)} workers)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Vectorized /predict_pipeline versus looping over /predict and /result.
+
+Joins the weather and grid stability validation CSVs on their timestamps,
+scores every row through pipeline.predict_grid, then replays --rows rows
+one at a time through the two HTML endpoints with the Flask test client.
+
+Run from Team8_VillainArc (needs both model files):
+    python benchmarks/bench_pipeline.py --rows 500
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import GRID_FEATURES, PIPELINE_FEATURES, parse_grid_timestamp
+
+
+def load_joined(weather_path, grid_path):
+    with open(grid_path, newline='') as f:
+        grid = {parse_grid_timestamp(r['date'], r['time']): [float(r[c]) for c in GRID_FEATURES]
+                for r in csv.DictReader(f)}
+    rows = []
+    with open(weather_path, newline='') as f:
+        for r in csv.DictReader(f):
+            key = datetime.strptime(r['DateTime'], '%Y-%m-%d %H:%M:%S')
+            if key in grid:
+                rows.append([float(r[c]) for c in PIPELINE_FEATURES[:3]] + grid[key])
+    return np.asarray(rows, dtype=np.float64)
+
+
+def loop_endpoints(client, X):
+    labels = []
+    for air_temperature, pressure, wind_speed, c1, c2, c3, p1, p2, p3 in X.tolist():
+        page = client.post('/predict', data={'air_temperature': air_temperature, 'pressure': pressure,
+                                             'wind_speed': wind_speed}).get_data(as_text=True)
+        power_gen = float(re.search(r'is: \[([^\]]+)\]', page).group(1))
+        page = client.post('/result', data={'c1': c1, 'c2': c2, 'c3': c3, 'p1': p1, 'p2': p2, 'p3': p3,
+                                            'PowerGen': power_gen}).get_data(as_text=True)
+        labels.append('Unstable' if 'Unstable' in page else 'Stable')
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weather', default='wind_power_gen_3months_validation_data.csv')
+    parser.add_argument('--grid', default='grid_stability_3months_validation_data.csv')
+    parser.add_argument('--rows', type=int, default=500, help='rows replayed through the two endpoints')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    import app1
+    from pipeline import predict_grid
+
+    # Leave the prediction caches out of the comparison
+    app1.create_app({'PREDICTION_CACHE_TTL': 0})
+
+    X = load_joined(args.weather, args.grid)
+    start = time.perf_counter()
+    result = predict_grid(app1.model, app1.model1, X)
+    pipeline_rate = len(X) / (time.perf_counter() - start)
+
+    sample = X[:args.rows]
+    client = app1.app.test_client()
+    start = time.perf_counter()
+    labels = loop_endpoints(client, sample)
+    loop_rate = len(sample) / (time.perf_counter() - start)
+
+    agreement = np.mean(np.asarray(labels) == result['stability'][:len(sample)])
+    print(f'{len(X)} joined rows')
+    print(f'pipeline          {pipeline_rate:10.0f} rows/s')
+    print(f'/predict+/result  {loop_rate:10.0f} rows/s   (pipeline {pipeline_rate / loop_rate:.0f}x faster)')
+    print(f'stability agreement on {len(sample)} rows: {agreement:.1%} (endpoints round PowerGen in the HTML)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Cost of per-tree quantile bands versus point predictions.
+
+Compares FlatForest.predict with predict_quantiles (both one traversal of
+every tree), the single-row paths, and the naive approach of calling each
+of the forest's estimators in turn. Also checks that the band's mean is
+identical to predict.
+
+Run from Team8_VillainArc:
+    python benchmarks/bench_quantiles.py --rows 500
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flat_forest import DEFAULT_QUANTILES, FlatForest, read_columns
+
+
+def best_seconds(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_row_us(predict, X):
+    start = time.perf_counter()
+    for row in X:
+        predict(row)
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(ROOT, 'final_power_gen_model.joblib'))
+    parser.add_argument('--data', default=os.path.join(ROOT, 'wind_power_gen_3months_validation_data.csv'))
+    parser.add_argument('--rows', type=int, default=500, help='rows used for the single-row timing')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    model = joblib.load(args.model)
+    forest = FlatForest.from_sklearn(model)
+    X = read_columns(args.data, ['AirTemp', 'Pressure', 'WindSpeed'])
+    sample = X[:args.rows]
+
+    bands = forest.predict_quantiles(X, DEFAULT_QUANTILES)
+    if not np.array_equal(bands['mean'], model.predict(X)):
+        raise AssertionError('Quantile mean differs from model.predict.')
+    print(f'{forest.n_trees} trees, {len(X)} rows, mean identical to model.predict; '
+          f'median band width P90-P10 {np.median(bands["P90"] - bands["P10"]):.2f}')
+
+    point = best_seconds(lambda: forest.predict(X))
+    banded = best_seconds(lambda: forest.predict_quantiles(X, DEFAULT_QUANTILES))
+    naive = best_seconds(lambda: np.quantile(np.column_stack([tree.predict(X) for tree in model.estimators_]),
+                                             DEFAULT_QUANTILES, axis=1), repeat=1)
+    print(f'batch        predict {len(X) / point:9.0f} rows/s   quantiles {len(X) / banded:9.0f} rows/s   '
+          f'per-estimator loop {len(X) / naive:9.0f} rows/s')
+
+    point_us = per_row_us(forest.predict_one, sample)
+    banded_us = per_row_us(lambda row: forest.predict_quantiles_one(row, DEFAULT_QUANTILES), sample)
+    print(f'single row   predict_one {point_us:7.1f} us   predict_quantiles_one {banded_us:7.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Latency of month-long range queries on the time-series store.
+
+Run from Team8_VillainArc after ingesting:
+    python timeseries_store.py ingest wind_power_gen_5years_training_data.csv wind_power_gen_3months_validation_data.csv
+    python benchmarks/bench_timeseries.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries_store import DEFAULT_PATH, TimeSeriesStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    store = TimeSeriesStore(args.db)
+    months = np.arange(np.datetime64('2019-01'), np.datetime64('2024-04'))
+    print(f'{store.count()} rows, {len(months)} months')
+    for freq in ('raw', 'hourly', 'daily'):
+        timings = []
+        for month in months:
+            start = time.perf_counter()
+            store.history(str(month), str(month + 1), freq)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f'{freq:<8} mean {np.mean(timings):6.2f} ms   p95 {np.percentile(timings, 95):6.2f} ms   max {max(timings):6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Requests/sec on the legacy app.py /app1 route, per-request commits versus write-behind.
+
+Each mode runs against a fresh SQLite database with --threads concurrent
+clients. The route expects static/models/final_power_gen_model.joblib.
+
+Run from Team8_VillainArc:
+    python benchmarks/bench_write_behind.py --requests 2000 --threads 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def drive(app, requests, threads):
+    def post(i):
+        client = app.test_client()
+        return client.post('/app1', data={'airtemperature': 5 + i % 20, 'pressure': 0.98,
+                                          'windspeed': 3 + i % 10}).status_code
+
+    start = time.perf_counter()
+    # The route prints every prediction; keep that off the terminal
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(threads) as pool:
+        statuses = list(pool.map(post, range(requests)))
+    return requests / (time.perf_counter() - start), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SUSTAINAWATT_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        from jinja2 import ChoiceLoader, DictLoader
+        from app import App1, app, db, prediction_log
+
+        # The legacy app ships no app1.html; an empty stub keeps rendering out of the timing
+        app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader({'app1.html': ''})])
+
+        for write_behind in (False, True):
+            app.config['WRITE_BEHIND'] = write_behind
+            with app.app_context():
+                db.session.query(App1).delete()
+                db.session.commit()
+            rate, statuses = drive(app, args.requests, args.threads)
+            prediction_log.flush()
+            with app.app_context():
+                stored = db.session.query(App1).count()
+            label = 'write-behind' if write_behind else 'commit per request'
+            print(f'{label:<20}{rate:10.0f} req/s   {stored} rows stored   statuses {sorted(set(statuses))}')
+        print(prediction_log.stats())
+
+
+if __name__ == '__main__':
+    main()
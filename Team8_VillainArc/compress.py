@@ -0,0 +1,216 @@
+"""Compressed variants of a production model, with an accuracy/latency report.
+
+Each variant is a '+'-joined list of steps applied to the published model
+(train.py's current version, else the legacy joblib file):
+
+    trees=N          keep the first N trees
+    depth=D          cut every tree at depth D; cut nodes predict their stored mean
+    float32          store thresholds and node values as float32
+    distill=NxD      fit an N-tree, depth-D forest to the model's own predictions
+                     on the training CSV, then apply the other steps to it
+
+Every variant is saved in the FlatForest format app1.py serves from and
+measured on the validation CSV: MSE/R^2 (accuracy/F1 for stability), the
+largest difference from the full model, file size, load time and per-row
+and batch latency. --publish makes one variant the current version; every
+ModelManager picks it up, after its usual hold-out check.
+
+    python compress.py --variants full trees=20 depth=12 trees=20+depth=12+float32 distill=10x12
+    python compress.py --variants trees=20+depth=12+float32 --publish trees=20+depth=12+float32
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from flat_forest import EstimatorAdapter, FlatForest
+from model_registry import DEFAULT_MODEL_DIR, FLAT_SUFFIX, new_version, resolve_model_path, write_manifest
+from train import DATA_DIR, HOLDOUT_DATA, MODELS, evaluate, load_training_data
+
+DEFAULT_VARIANTS = ['full', 'trees=50', 'trees=20', 'depth=16', 'depth=12', 'float32',
+                    'trees=20+depth=16+float32', 'distill=10x12']
+TRAINING_DATA = {
+    'power': os.path.join(DATA_DIR, 'wind_power_gen_5years_training_data.csv'),
+    'stability': os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+}
+
+
+# ********************************** Variants **********************************
+def parse_variant(spec):
+    steps = {}
+    for step in spec.split('+'):
+        key, _, value = step.partition('=')
+        if key == 'full':
+            continue
+        if key in ('trees', 'depth'):
+            steps[key] = int(value)
+        elif key == 'float32':
+            steps[key] = True
+        elif key == 'distill' and re.fullmatch(r'\d+x\d+', value):
+            steps[key] = tuple(int(part) for part in value.split('x'))
+        else:
+            raise ValueError(f'Unknown compression step {step!r} in {spec!r}.')
+    return steps
+
+
+def distill(kind, teacher, X_train, n_trees, max_depth, random_state=42):
+    """Fit a small forest to the teacher's predictions; rows need no labels."""
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    forest = RandomForestClassifier if kind == 'stability' else RandomForestRegressor
+    student = forest(n_estimators=n_trees, max_depth=max_depth, n_jobs=-1, random_state=random_state)
+    student.fit(X_train, teacher.predict(X_train))
+    return FlatForest.from_sklearn(student)
+
+
+def build_variant(kind, forest, spec, X_train):
+    steps = parse_variant(spec)
+    if 'distill' in steps:
+        forest = distill(kind, forest, X_train, *steps['distill'])
+    if 'trees' in steps or 'depth' in steps:
+        forest = forest.prune(steps.get('trees'), steps.get('depth'))
+    if steps.get('float32'):
+        forest = forest.astype(np.float32)
+    return forest
+
+
+# ********************************** Measurement **********************************
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def per_row_us(predict_one, X):
+    start = time.perf_counter()
+    for row in X:
+        predict_one(row)
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+
+def measure(kind, engine, path, load, X, y, reference, rows, load_repeat=3):
+    """Report entry for one saved model: accuracy on (X, y), agreement with reference, size and speed."""
+    load_s, _ = timed(lambda: load(path), load_repeat)
+    batch_s, predicted = timed(lambda: engine.predict(X))
+    entry = {
+        'metrics': evaluate(kind, engine, X, y),
+        'size_mb': os.path.getsize(path) / (1024 * 1024),
+        'load_ms': load_s * 1000,
+        'row_us': per_row_us(engine.predict_one, X[:rows]),
+        'batch_rows_per_s': len(X) / batch_s,
+    }
+    if kind == 'stability':
+        entry['agreement'] = float(np.mean(predicted == reference))
+    else:
+        entry['max_abs_diff'] = float(np.max(np.abs(predicted - reference)))
+    if isinstance(engine, FlatForest):
+        entry.update(trees=engine.n_trees, nodes=engine.n_nodes)
+    return entry
+
+
+def compress(kind, variants, model_dir=DEFAULT_MODEL_DIR, train_data=None, rows=500, out_dir=None):
+    """Build and measure every variant; returns (report, {spec: FlatForest})."""
+    source = resolve_model_path(MODELS[kind]['name'], model_dir)
+    X, y = load_training_data(kind, HOLDOUT_DATA[kind])
+    X_train = None
+    if any('distill' in parse_variant(spec) for spec in variants):
+        X_train, _ = load_training_data(kind, train_data or TRAINING_DATA[kind])
+
+    report = {'model': kind, 'source': os.path.abspath(source), 'validation': HOLDOUT_DATA[kind],
+              'rows': len(X), 'variants': {}}
+    if source.endswith(FLAT_SUFFIX):
+        forest = FlatForest.load(source, mmap_mode=None)
+        reference = forest.predict(X)
+    else:
+        model = joblib.load(source)
+        forest = FlatForest.from_sklearn(model)
+        reference = model.predict(X)
+        # The unconverted scikit-learn model, as app.py and the notebooks load it
+        report['variants']['sklearn'] = measure(kind, EstimatorAdapter(model), source, joblib.load, X, y, reference,
+                                                rows, load_repeat=1)
+        del model
+
+    forests = {}
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+        for spec in variants:
+            variant = build_variant(kind, forest, spec, X_train)
+            path = os.path.join(tmp, f'variant{len(forests)}{FLAT_SUFFIX}')
+            variant.save(path, variant=spec)
+            report['variants'][spec] = measure(kind, variant, path, lambda p: FlatForest.load(p, mmap_mode=None),
+                                               X, y, reference, rows)
+            forests[spec] = variant
+    return report, forests
+
+
+# ********************************** Publishing **********************************
+def publish(kind, forest, spec, entry, model_dir=DEFAULT_MODEL_DIR):
+    """Save a variant as a new version and point the model's manifest at it."""
+    name = MODELS[kind]['name']
+    label = re.sub(r'[^A-Za-z0-9]+', '-', spec).strip('-')
+    version = new_version(name, model_dir, label)
+    artifact = f'{name}-{version}{FLAT_SUFFIX}'
+    os.makedirs(model_dir, exist_ok=True)
+
+    path = os.path.join(model_dir, artifact)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    forest.save(tmp, variant=spec)
+    os.replace(tmp, path)
+    with open(os.path.join(model_dir, f'{name}-{version}.json'), 'w') as f:
+        json.dump(dict(entry, model=kind, version=version, variant=spec, artifact=path), f, indent=2)
+    write_manifest(name, {'name': name, 'version': version, 'artifact': artifact, 'metrics': entry['metrics']},
+                   model_dir)
+    return version
+
+
+# ********************************** Command line **********************************
+def print_report(report):
+    drift = 'agreement' if report['model'] == 'stability' else 'max_abs_diff'
+    metrics = list(next(iter(report['variants'].values()))['metrics'])
+    print(f'{report["rows"]} validation rows from {os.path.basename(report["validation"])}')
+    print(f'{"variant":<28}{"nodes":>10}' + ''.join(f'{name:>10}' for name in metrics)
+          + f'{drift:>13}{"MB":>9}{"load ms":>10}{"row us":>9}{"rows/s":>10}')
+    for spec, entry in report['variants'].items():
+        print(f'{spec:<28}{entry.get("nodes", ""):>10}' + ''.join(f'{entry["metrics"][name]:10.5g}' for name in metrics)
+              + f'{entry[drift]:13.4g}{entry["size_mb"]:9.1f}{entry["load_ms"]:10.1f}{entry["row_us"]:9.1f}'
+              f'{entry["batch_rows_per_s"]:10.0f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and compare compressed model variants.')
+    parser.add_argument('--model', choices=sorted(MODELS), default='power')
+    parser.add_argument('--variants', nargs='+', default=DEFAULT_VARIANTS, metavar='SPEC')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--train-data', help='CSV whose rows distill= variants are fitted on')
+    parser.add_argument('--rows', type=int, default=500, help='rows used for the per-row latency')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--publish', metavar='SPEC', help='make this variant the current published version')
+    args = parser.parse_args(argv)
+
+    variants = list(dict.fromkeys(args.variants + ([args.publish] if args.publish else [])))
+    for spec in variants:
+        try:
+            parse_variant(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    report, forests = compress(args.model, variants, args.model_dir, args.train_data, args.rows)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.publish:
+        version = publish(args.model, forests[args.publish], args.publish, report['variants'][args.publish],
+                          args.model_dir)
+        print(f'\npublished {args.publish} as version {version}')
+
+
+if __name__ == '__main__':
+    main()
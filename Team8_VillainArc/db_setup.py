@@ -0,0 +1,46 @@
+from sqlalchemy import event, inspect, text
+
+# WAL lets readers run alongside the writer; NORMAL sync only fsyncs at checkpoints
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,
+    'busy_timeout': 5000,
+}
+
+
+def tune_sqlite(engine, pragmas=SQLITE_PRAGMAS):
+    """Apply the pragmas to every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def add_missing_columns(engine, table):
+    """ALTER TABLE ADD COLUMN for model columns an existing database predates.
+
+    db.create_all() only creates missing tables, so columns added to a model
+    later would otherwise never reach databases created before them.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def create_missing_indexes(engine, table):
+    """CREATE INDEX for model indexes an existing database predates; create_all() skips existing tables."""
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
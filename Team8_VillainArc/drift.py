@@ -0,0 +1,269 @@
+"""Input range checks and data drift scores for live prediction traffic.
+
+A reference profile per model is computed once from a CSV the model was
+trained on: every input feature's range, mean, standard deviation and a
+histogram over equal-width bins spanning that range (plus one bin below and
+one above it). It is cached in instance/drift_reference.json next to the
+CSV's size and mtime, so a restart only re-reads the CSV after it changes.
+
+DriftMonitor.observe_one() checks a request's row against the reference
+range and drops it into the live histogram with a handful of float
+operations per feature, independent of traffic volume or history; observe()
+does the same for a batch with a few vectorized NumPy calls. Only counts and
+sums are kept, never the rows themselves, in two rotating windows, so
+scores cover the last one to two windows of traffic. report() gives each
+feature's population stability index (PSI) against the reference, its mean
+shift in reference standard deviations and how many rows were out of range.
+
+    python drift.py                  # rebuild the reference profiles
+    python drift.py --replay ../Data/wind_power_gen_3months_validation_data.csv --model power
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from batch_predict import BatchInputError
+from metrics import out_of_range_total
+from model_registry import source_signature
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data')
+DEFAULT_REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance',
+                                      'drift_reference.json')
+
+# Raw inputs of each model as the routes receive them, and the CSV each reference comes from
+DRIFT_FEATURES = {
+    'power': ['AirTemp', 'Pressure', 'WindSpeed'],
+    'stability': ['c1', 'c2', 'c3', 'p1', 'p2', 'p3', 'PowerGen'],
+}
+REFERENCE_DATA = {
+    'power': os.path.join(DATA_DIR, 'wind_power_gen_5years_training_data.csv'),
+    'stability': os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+}
+DEFAULT_BINS = 20
+# Conventional PSI reading: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 drifted
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+# Stand-in for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+# ********************************** Reference profiles **********************************
+def build_reference(X, features, bins=DEFAULT_BINS):
+    """Range, moments and binned distribution of each column of X."""
+    X = np.asarray(X, dtype=np.float64)
+    profile = {}
+    for i, name in enumerate(features):
+        column = X[:, i][np.isfinite(X[:, i])]
+        low, high = float(column.min()), float(column.max())
+        counts = np.zeros(bins + 2)
+        counts[1:-1] = np.histogram(column, bins=bins, range=(low, high))[0]
+        profile[name] = {
+            'min': low,
+            'max': high,
+            'mean': float(column.mean()),
+            'std': float(column.std()),
+            'proportions': (counts / len(column)).tolist(),
+        }
+    return profile
+
+
+def load_reference(kind, data_path=None, cache_path=DEFAULT_REFERENCE_PATH, bins=DEFAULT_BINS):
+    """Reference profile for a model, recomputed only when its CSV (or the bin count) changes."""
+    data_path = data_path or REFERENCE_DATA[kind]
+    signature = dict(source_signature(data_path), path=os.path.abspath(data_path), bins=bins)
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cached = {}
+    entry = cached.get(kind)
+    if entry is not None and entry['source'] == signature:
+        return entry['features']
+
+    import pandas as pd
+
+    features = DRIFT_FEATURES[kind]
+    X = pd.read_csv(data_path, usecols=features, dtype='float64')[features].to_numpy()
+    cached[kind] = {'source': signature, 'features': build_reference(X, features, bins)}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cached, f, indent=2)
+    os.replace(tmp, cache_path)
+    return cached[kind]['features']
+
+
+def psi(live, reference):
+    live = np.maximum(live, PSI_EPSILON)
+    reference = np.maximum(reference, PSI_EPSILON)
+    return float(np.sum((live - reference) * np.log(live / reference)))
+
+
+# ********************************** Live monitor **********************************
+class _Window:
+    __slots__ = ('started', 'rows', 'counts', 'sums', 'squares', 'out_of_range')
+
+    def __init__(self, n_features, n_bins):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.counts = np.zeros((n_features, n_bins), dtype=np.int64)
+        self.sums = np.zeros(n_features)
+        self.squares = np.zeros(n_features)
+        self.out_of_range = np.zeros(n_features, dtype=np.int64)
+
+
+class DriftMonitor:
+
+    def __init__(self, kind, reference, tolerance=0.1, window=3600.0):
+        """tolerance widens each reference range by that fraction of its span before a value is flagged."""
+        self.kind = kind
+        self.features = list(DRIFT_FEATURES[kind])
+        self.reference = reference
+        self.window = window
+        low = np.array([reference[name]['min'] for name in self.features])
+        high = np.array([reference[name]['max'] for name in self.features])
+        span = np.where(high > low, high - low, 1.0)
+        self.n_bins = len(reference[self.features[0]]['proportions'])
+        self.low = low
+        self.high = high
+        # Bin 0 is below the reference minimum, the last bin above its maximum, 1 + (x - min) * scale in between
+        self.scale = (self.n_bins - 2) / span
+        self.allowed_low = low - tolerance * span
+        self.allowed_high = high + tolerance * span
+        # Plain lists for the single-row path, where NumPy scalar indexing would dominate
+        self._bounds = list(zip(self.features, self.allowed_low.tolist(), self.allowed_high.tolist(),
+                                low.tolist(), high.tolist(), self.scale.tolist()))
+        self._lock = threading.Lock()
+        self._current = _Window(len(self.features), self.n_bins)
+        self._previous = None
+
+    @classmethod
+    def from_csv(cls, kind, data_path=None, cache_path=DEFAULT_REFERENCE_PATH, **kwargs):
+        return cls(kind, load_reference(kind, data_path, cache_path), **kwargs)
+
+    def _window(self):
+        # Called with the lock held
+        if time.monotonic() - self._current.started >= self.window:
+            self._previous = self._current
+            self._current = _Window(len(self.features), self.n_bins)
+        return self._current
+
+    def observe_one(self, row):
+        """Record one input row; returns the names of features outside the reference range."""
+        flagged = []
+        last_bin = self.n_bins - 1
+        with self._lock:
+            window = self._window()
+            window.rows += 1
+            for i, (name, allowed_low, allowed_high, low, high, scale) in enumerate(self._bounds):
+                x = float(row[i])
+                if not allowed_low <= x <= allowed_high:
+                    flagged.append(name)
+                    window.out_of_range[i] += 1
+                    if not math.isfinite(x):
+                        continue
+                if x < low:
+                    index = 0
+                elif x > high:
+                    index = last_bin
+                else:
+                    index = min(int((x - low) * scale) + 1, last_bin - 1)
+                window.counts[i, index] += 1
+                window.sums[i] += x
+                window.squares[i] += x * x
+        for name in flagged:
+            out_of_range_total.inc(self.kind, name)
+        return flagged
+
+    def observe(self, X):
+        """Record a batch; returns {feature: [row indices outside the reference range]} for flagged features."""
+        X = np.asarray(X, dtype=np.float64)
+        outside = ~((X >= self.allowed_low) & (X <= self.allowed_high))
+        finite = np.isfinite(X)
+        clean = np.where(finite, X, 0.0)
+        inner = np.minimum(np.floor((np.clip(clean, self.low, self.high) - self.low) * self.scale) + 1, self.n_bins - 2)
+        bins = np.where(clean < self.low, 0, np.where(clean > self.high, self.n_bins - 1, inner)).astype(np.intp)
+        with self._lock:
+            window = self._window()
+            window.rows += len(X)
+            for i in range(len(self.features)):
+                window.counts[i] += np.bincount(bins[finite[:, i], i], minlength=self.n_bins)
+            window.sums += clean.sum(axis=0)
+            window.squares += (clean * clean).sum(axis=0)
+            window.out_of_range += outside.sum(axis=0)
+        flagged = {}
+        for i, name in enumerate(self.features):
+            rows = np.flatnonzero(outside[:, i])
+            if rows.size:
+                flagged[name] = rows.tolist()
+                out_of_range_total.inc(self.kind, name, amount=int(rows.size))
+        return flagged
+
+    def report(self):
+        """Drift scores per feature over the current and previous window."""
+        with self._lock:
+            windows = [w for w in (self._previous, self._current) if w is not None]
+            rows = sum(w.rows for w in windows)
+            counts = sum(w.counts for w in windows)
+            sums = sum(w.sums for w in windows)
+            squares = sum(w.squares for w in windows)
+            out_of_range = sum(w.out_of_range for w in windows)
+            since = time.time() - (time.monotonic() - windows[0].started)
+
+        features = {}
+        for i, name in enumerate(self.features):
+            reference = self.reference[name]
+            entry = {'rows': int(counts[i].sum()), 'out_of_range': int(out_of_range[i]),
+                     'allowed_range': [float(self.allowed_low[i]), float(self.allowed_high[i])],
+                     'reference_mean': reference['mean'], 'reference_std': reference['std']}
+            if entry['rows']:
+                mean = sums[i] / entry['rows']
+                score = psi(counts[i] / entry['rows'], np.asarray(reference['proportions']))
+                entry.update(mean=float(mean),
+                             std=float(np.sqrt(max(squares[i] / entry['rows'] - mean * mean, 0.0))),
+                             mean_shift=float((mean - reference['mean']) / (reference['std'] or 1.0)),
+                             psi=score,
+                             status='drift' if score >= PSI_DRIFT else 'warn' if score >= PSI_WARN else 'ok')
+            features[name] = entry
+        return {'model': self.kind, 'rows': rows, 'since': since, 'window_seconds': self.window,
+                'features': features}
+
+
+def check_inputs(monitor, X, single=False, reject=False):
+    """Record X with monitor (if any); flagged features or None, BatchInputError instead when reject is set."""
+    if monitor is None:
+        return None
+    flagged = monitor.observe_one(X[0]) if single else monitor.observe(X)
+    if flagged and reject:
+        raise BatchInputError(f'Outside the range the model was trained on: {", ".join(flagged)}.')
+    return flagged or None
+
+
+# ********************************** Command line **********************************
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Build drift reference profiles or score a CSV against them.')
+    parser.add_argument('--model', choices=sorted(DRIFT_FEATURES), action='append',
+                        help='default: every model')
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS)
+    parser.add_argument('--replay', help='CSV scored as if its rows were live traffic')
+    args = parser.parse_args(argv)
+
+    for kind in args.model or sorted(DRIFT_FEATURES):
+        monitor = DriftMonitor(kind, load_reference(kind, bins=args.bins))
+        if args.replay is None:
+            print(f'{kind}: reference from {REFERENCE_DATA[kind]}')
+            continue
+        X = pd.read_csv(args.replay, usecols=monitor.features, dtype='float64')[monitor.features].to_numpy()
+        monitor.observe(X)
+        print(json.dumps(monitor.report(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""Array-backed tree ensembles for low-overhead inference.
+
+FlatForest packs every tree of a fitted scikit-learn forest (or single tree)
+into contiguous feature/threshold/children/value arrays. Leaves point to
+themselves, so traversal is a handful of NumPy gathers per tree level. The
+arithmetic mirrors scikit-learn's own predict path (float32 inputs compared
+against float64 thresholds, per-tree accumulation in estimator order), so
+results match model.predict bit for bit.
+
+    python flat_forest.py            # verify both production models
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+
+# Keep (rows x trees) work arrays around a few MB per chunk
+MAX_CHUNK_CELLS = 1 << 20
+
+# P10/P50/P90 generation bands
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def quantile_name(q):
+    return f'P{q * 100:g}'
+
+
+def _normalizes_leaf_counts():
+    # scikit-learn < 1.4 stored class counts in tree_.value and normalized in predict_proba
+    import sklearn
+    major, minor = (int(part) for part in sklearn.__version__.split('.')[:2])
+    return (major, minor) < (1, 4)
+
+
+class FlatForest:
+
+    def __init__(self, feature, threshold, children, value, roots, n_features, classes=None):
+        self.feature = feature
+        self.threshold = threshold
+        # (n_nodes, 2) left/right child pairs, flattened so a node's branch is children[2 * node + go_right]
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.n_features = int(n_features)
+        self.classes_ = classes
+        self.metadata = {}
+
+    @property
+    def is_classifier(self):
+        return self.classes_ is not None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.threshold)
+
+    # ********************************** Conversion **********************************
+    @classmethod
+    def from_sklearn(cls, model):
+        from sklearn.ensemble import (ExtraTreesClassifier, ExtraTreesRegressor,
+                                      RandomForestClassifier, RandomForestRegressor)
+        from sklearn.tree import BaseDecisionTree
+
+        if isinstance(model, (RandomForestRegressor, RandomForestClassifier,
+                              ExtraTreesRegressor, ExtraTreesClassifier)):
+            estimators = model.estimators_
+        elif isinstance(model, BaseDecisionTree):
+            estimators = [model]
+        else:
+            raise TypeError(f'Cannot flatten {type(model).__name__}; expected a random forest or decision tree.')
+        if model.n_outputs_ != 1:
+            raise TypeError('Only single-output models can be flattened.')
+
+        classes = getattr(model, 'classes_', None)
+        normalize = classes is not None and _normalizes_leaf_counts()
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so traversal can run until nothing moves
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            children.append((np.column_stack([np.where(is_leaf, nodes, tree.children_left),
+                                              np.where(is_leaf, nodes, tree.children_right)]) + offset).astype(np.int32))
+
+            if classes is None:
+                values.append(tree.value[:, 0, 0].astype(np.float64))
+            else:
+                proba = tree.value[:, 0, :len(classes)].astype(np.float64)
+                if normalize:
+                    normalizer = proba.sum(axis=1)[:, np.newaxis]
+                    normalizer[normalizer == 0.0] = 1.0
+                    proba /= normalizer
+                values.append(proba)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(np.concatenate(features), np.concatenate(thresholds),
+                   np.concatenate(children).ravel(), np.concatenate(values), np.asarray(roots, dtype=np.int32),
+                   model.n_features_in_, classes)
+
+    # ********************************** Compression **********************************
+    def depths(self):
+        """Depth of every node below its tree's root (-1 for nodes no root reaches)."""
+        depth = np.full(self.n_nodes, -1, dtype=np.int32)
+        pairs = self.children.reshape(-1, 2)
+        frontier, level = np.asarray(self.roots), 0
+        while frontier.size:
+            depth[frontier] = level
+            kids = pairs[frontier]
+            frontier = kids[kids[:, 0] != frontier].ravel()
+            level += 1
+        return depth
+
+    def prune(self, n_trees=None, max_depth=None):
+        """Copy keeping only the first n_trees trees, each cut off below max_depth.
+
+        Internal nodes at max_depth become leaves that predict their stored
+        value, which for a regressor is the mean target of the training rows
+        that reached them (class frequencies for a classifier).
+        """
+        n_trees = self.n_trees if n_trees is None else max(1, min(int(n_trees), self.n_trees))
+        depth = self.depths()
+        keep = depth >= 0
+        if n_trees < self.n_trees:
+            keep[self.roots[n_trees]:] = False
+        if max_depth is not None:
+            keep &= depth <= max_depth
+
+        old = np.flatnonzero(keep)
+        index = np.cumsum(keep) - 1
+        pairs = self.children.reshape(-1, 2)[old]
+        leaf = pairs[:, 0] == old
+        if max_depth is not None:
+            leaf |= depth[old] == max_depth
+        new = np.arange(old.size)
+        children = np.where(leaf[:, np.newaxis], new[:, np.newaxis], index[pairs]).astype(np.int32).ravel()
+        return type(self)(np.where(leaf, 0, self.feature[old]).astype(self.feature.dtype),
+                          np.where(leaf, 0.0, self.threshold[old]).astype(self.threshold.dtype),
+                          children, np.array(self.value[old]), index[self.roots[:n_trees]].astype(np.int32),
+                          self.n_features, self.classes_)
+
+    def astype(self, dtype):
+        """Copy with thresholds and node values stored as dtype, e.g. np.float32 to halve their size."""
+        threshold = self.threshold.astype(dtype)
+        # Round thresholds down, never up: inputs are float32, so every split still sends each row the same way
+        above = threshold > self.threshold
+        threshold[above] = np.nextafter(threshold[above], np.asarray(-np.inf, dtype=threshold.dtype))
+        return type(self)(np.array(self.feature), threshold, np.array(self.children),
+                          self.value.astype(dtype), np.array(self.roots), self.n_features, self.classes_)
+
+    # ********************************** Persistence **********************************
+    def save(self, path, **metadata):
+        """Dump the arrays uncompressed so load() can memory-map them."""
+        import joblib
+
+        state = {name: getattr(self, name) for name in ('feature', 'threshold', 'children', 'value', 'roots')}
+        state.update(n_features=self.n_features, classes=self.classes_, metadata=metadata)
+        joblib.dump(state, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved forest; with mmap_mode='r' the arrays stay in the shared page cache."""
+        import joblib
+
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        arrays = [np.asarray(state[name]) for name in ('feature', 'threshold', 'children', 'value', 'roots')]
+        forest = cls(*arrays, n_features=state['n_features'], classes=state['classes'])
+        forest.metadata = state['metadata']
+        return forest
+
+    # ********************************** Inference **********************************
+    def _check(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'X has {X.shape[-1] if X.ndim else 0} features, but the model expects {self.n_features}.')
+        if not np.isfinite(X).all():
+            raise ValueError('Input X contains NaN or infinity.')
+        return X
+
+    def apply(self, X):
+        """Return the (n_samples, n_trees) array of leaf indices reached by each row."""
+        X = self._check(X)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.int32)
+        chunk = max(1, MAX_CHUNK_CELLS // self.n_trees)
+        for start in range(0, X.shape[0], chunk):
+            out[start:start + chunk] = self._leaves(X[start:start + chunk])
+        return out
+
+    def _leaves(self, X):
+        n_samples = X.shape[0]
+        X_flat = X.ravel()
+        node = np.tile(self.roots, n_samples)
+        row_offset = np.repeat(np.arange(n_samples) * self.n_features, self.n_trees)
+        active = np.arange(node.size)
+        while active.size:
+            current = node[active]
+            x = X_flat[row_offset[active] + self.feature[current]]
+            nxt = self.children[2 * current + (x > self.threshold[current])]
+            node[active] = nxt
+            active = active[self.children[2 * nxt] != nxt]
+        return node.reshape(n_samples, self.n_trees)
+
+    def _accumulate(self, leaf_values):
+        # Sum tree by tree, exactly like scikit-learn's forest accumulation
+        total = np.zeros(leaf_values.shape[:1] + leaf_values.shape[2:], dtype=np.float64)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        total /= self.n_trees
+        return total
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError('predict_proba is only available for classifiers.')
+        return self._accumulate(self.value[self.apply(X)])
+
+    def predict(self, X):
+        leaf_values = self.value[self.apply(X)]
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(self._accumulate(leaf_values), axis=1), axis=0)
+        return self._accumulate(leaf_values)
+
+    def _leaves_one(self, row):
+        x = self._check([row])[0]
+        node = self.roots
+        while True:
+            nxt = self.children[2 * node + (x[self.feature[node]] > self.threshold[node])]
+            if np.array_equal(nxt, node):
+                return node
+            node = nxt
+
+    def predict_one(self, row):
+        """Fast path for a single row: walks all trees level by level, no batching overhead."""
+        node = self._leaves_one(row)
+        if self.is_classifier:
+            proba = self._accumulate(self.value[node][np.newaxis])
+            return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+        total = 0.0
+        for leaf_value in self.value[node].tolist():
+            total += leaf_value
+        return np.array([total / self.n_trees])
+
+    # ********************************** Per-tree predictions **********************************
+    def predict_trees(self, X):
+        """(n_samples, n_trees) output of every tree, gathered from the single traversal predict() uses."""
+        if self.is_classifier:
+            raise AttributeError('Per-tree predictions are only available for regressors.')
+        return self.value[self.apply(X)]
+
+    def predict_quantiles(self, X, quantiles=DEFAULT_QUANTILES):
+        """Mean (equal to predict), std and linearly interpolated quantiles across the trees."""
+        return self._summarize(self.predict_trees(X), quantiles)
+
+    def predict_quantiles_one(self, row, quantiles=DEFAULT_QUANTILES):
+        if self.is_classifier:
+            raise AttributeError('Per-tree predictions are only available for regressors.')
+        return self._summarize(self.value[self._leaves_one(row)][np.newaxis], quantiles)
+
+    def _summarize(self, per_tree, quantiles):
+        summary = {'mean': self._accumulate(per_tree), 'std': per_tree.std(axis=1, dtype=np.float64)}
+        for q, values in zip(quantiles, np.quantile(per_tree, quantiles, axis=1)):
+            summary[quantile_name(q)] = values
+        return summary
+
+
+class EstimatorAdapter:
+    """Gives models that cannot be flattened the same predict/predict_one interface."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def predict(self, X):
+        return self.model.predict(np.asarray(X, dtype=np.float64))
+
+    def predict_one(self, row):
+        return self.model.predict(np.array([row], dtype=np.float64))
+
+    def predict_quantiles(self, X, quantiles=DEFAULT_QUANTILES):
+        # One predict per fitted tree; only ensembles have a spread to report
+        X = np.asarray(X, dtype=np.float64)
+        per_tree = np.column_stack([tree.predict(X) for tree in self.model.estimators_])
+        summary = {'mean': self.model.predict(X), 'std': per_tree.std(axis=1)}
+        for q, values in zip(quantiles, np.quantile(per_tree, quantiles, axis=1)):
+            summary[quantile_name(q)] = values
+        return summary
+
+    def predict_quantiles_one(self, row, quantiles=DEFAULT_QUANTILES):
+        return self.predict_quantiles([row], quantiles)
+
+
+def compile_model(model):
+    try:
+        return FlatForest.from_sklearn(model)
+    except TypeError:
+        return EstimatorAdapter(model)
+
+
+def load_model(path):
+    import joblib
+
+    return compile_model(joblib.load(path))
+
+
+# ********************************** Verification **********************************
+def read_columns(path, columns):
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        rows = [[float(record[name]) for name in columns] for record in reader]
+    return np.asarray(rows, dtype=np.float64)
+
+
+def verify(model, forest, X):
+    """Check the flat forest against model.predict on X, batch and single-row paths."""
+    expected = model.predict(X)
+    if not np.array_equal(expected, forest.predict(X)):
+        raise AssertionError('Batch predictions differ from model.predict.')
+    for i in range(X.shape[0]):
+        if not np.array_equal(expected[i:i + 1], forest.predict_one(X[i])):
+            raise AssertionError(f'Single-row prediction differs from model.predict at row {i}.')
+    return X.shape[0]
+
+
+def main():
+    import warnings
+
+    import joblib
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Verify flattened models against scikit-learn.')
+    parser.add_argument('--power-model', default=os.path.join(package_dir, 'final_power_gen_model.joblib'))
+    parser.add_argument('--stability-model', default=os.path.join(package_dir, 'FinalPred.joblib'))
+    parser.add_argument('--power-data', default=os.path.join(package_dir, 'wind_power_gen_3months_validation_data.csv'))
+    parser.add_argument('--stability-data',
+                        default=os.path.join(package_dir, 'grid_stability_3months_validation_data.csv'))
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    checks = [
+        (args.power_model, args.power_data, ['AirTemp', 'Pressure', 'WindSpeed']),
+        (args.stability_model, args.stability_data,
+         ['c1', 'c2', 'c3', 'p1', 'p2', 'p3', 'PowerGen', 'power_gen1', 'power_gen2', 'power_gen3']),
+    ]
+    for model_path, data_path, columns in checks:
+        model = joblib.load(model_path)
+        forest = FlatForest.from_sklearn(model)
+        rows = verify(model, forest, read_columns(data_path, columns))
+        print(f'{model_path}: {forest.n_trees} trees, {forest.n_nodes} nodes, {rows} rows identical to model.predict')
+
+
+if __name__ == '__main__':
+    main()
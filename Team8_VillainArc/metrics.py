@@ -0,0 +1,243 @@
+"""In-process request, model and database metrics in Prometheus text format.
+
+Counters are always exact. Route and stage timings are only taken for a
+sampled fraction of requests (METRICS_SAMPLE_RATE), so an unsampled request
+pays for one random() call and a no-op context manager per stage; the
+histograms' _count series therefore count sampled requests. Each worker
+process keeps its own numbers, so scrape workers individually.
+
+    init_app(app)                    # request timings and /metrics
+    instrument_session(db.session)   # commit latency per table
+    with stage('render'): ...        # per-stage timing inside a route
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Seconds, from sub-millisecond single-row inference up to slow batch uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics = []
+        self.sample_rate = 1.0
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = ['# HELP metrics_sample_rate Fraction of requests whose latency is recorded.',
+                 '# TYPE metrics_sample_rate gauge',
+                 f'metrics_sample_rate {self.sample_rate}']
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+requests_total = METRICS.counter('http_requests_total', 'HTTP requests by route, method and status.',
+                                 ('route', 'method', 'status'))
+request_seconds = METRICS.histogram('http_request_duration_seconds', 'Sampled request latency.',
+                                    ('route', 'method', 'status'))
+stage_seconds = METRICS.histogram('http_request_stage_duration_seconds', 'Sampled latency of a stage of a route.',
+                                  ('route', 'stage'))
+inferences_total = METRICS.counter('model_inference_calls_total', 'predict()/predict_one() calls per model.',
+                                   ('model',))
+inference_rows = METRICS.histogram('model_inference_rows', 'Rows scored per inference call.', ('model',),
+                                   buckets=ROW_BUCKETS)
+db_commit_seconds = METRICS.histogram('db_commit_duration_seconds', 'Database commit latency by table written.',
+                                      ('table',))
+out_of_range_total = METRICS.counter('model_input_out_of_range_total',
+                                     'Input values outside the range a model was trained on.', ('model', 'feature'))
+
+
+# ********************************** Recording helpers **********************************
+def record_inference(model, rows):
+    inferences_total.inc(model)
+    inference_rows.observe(rows, model)
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage_seconds.observe(time.perf_counter() - self.started, _route(), self.name)
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Time the enclosed block as a stage of the current route when the request is sampled."""
+    if g.get('metrics_started') is None:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _tables(session):
+    # Objects added before commit() are still pending, so the tables are known before the flush
+    tables = {obj.__table__.name for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+              if hasattr(obj, '__table__')}
+    return ','.join(sorted(tables)) or 'none'
+
+
+def instrument_session(session):
+    """Observe db_commit_seconds for every commit of a (scoped) SQLAlchemy session."""
+    from sqlalchemy import event
+
+    @event.listens_for(session, 'before_commit')
+    def before_commit(sess):
+        sess.info['metrics_commit'] = (time.perf_counter(), _tables(sess))
+
+    @event.listens_for(session, 'after_commit')
+    def after_commit(sess):
+        started = sess.info.pop('metrics_commit', None)
+        if started is not None:
+            db_commit_seconds.observe(time.perf_counter() - started[0], started[1])
+
+
+# ********************************** Flask integration **********************************
+def init_app(app, sample_rate=None, endpoint='/metrics'):
+    """Record request counts and sampled latencies for app and serve them on endpoint.
+
+    Without a sample_rate, METRICS_SAMPLE_RATE is read from app.config on every
+    request, so it can still be changed after init_app().
+    """
+
+    @app.before_request
+    def start_timer():
+        rate = sample_rate if sample_rate is not None else app.config.get('METRICS_SAMPLE_RATE', 1.0)
+        METRICS.sample_rate = rate
+        if rate >= 1.0 or random.random() < rate:
+            g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        # Counted here rather than in after_request, which is skipped when an exception escapes the view
+        status = g.get('metrics_status')
+        if status is None:
+            if exc is None:
+                return
+            status = 500
+        route = _route()
+        status = str(status)
+        requests_total.inc(route, request.method, status)
+        started = g.get('metrics_started')
+        if started is not None:
+            request_seconds.observe(time.perf_counter() - started, route, request.method, status)
+
+    @app.route(endpoint)
+    def metrics():
+        return app.response_class(METRICS.render(), content_type=CONTENT_TYPE)
+
+    return METRICS
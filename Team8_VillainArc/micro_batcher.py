@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class _Pending:
+    __slots__ = ('row', 'future', 'enqueued')
+
+    def __init__(self, row):
+        self.row = row
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one predict() call.
+
+    Callers block in predict() while a background thread collects rows for up
+    to max_wait_ms (or until max_batch_size rows are queued), scores them as a
+    single matrix and hands every caller its own slice of the output. If the
+    batch fails its rows are retried one by one, so only the bad rows fail.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, name='model'):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        self._batch_sizes = {}
+        self._wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._rows = 0
+        self._batches = 0
+        self._errors = 0
+
+    # ********************************** Public API **********************************
+    def submit(self, row):
+        self._ensure_worker()
+        pending = _Pending(row)
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, row, timeout=None):
+        """Return the prediction for one row, shaped like model.predict([row])."""
+        return self.submit(row).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            wait_histogram = {f'le_{bound}ms': count for bound, count in zip(WAIT_BUCKETS_MS, self._wait_counts)}
+            wait_histogram['le_inf'] = self._wait_counts[-1]
+            return {
+                'name': self.name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'rows': self._rows,
+                'batches': self._batches,
+                'errors': self._errors,
+                'mean_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'wait_ms_mean': self._wait_total * 1000.0 / self._rows if self._rows else 0.0,
+                'wait_ms_max': self._wait_max * 1000.0,
+                'wait_ms_histogram': wait_histogram,
+            }
+
+    # ********************************** Background worker **********************************
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so prefork servers get one worker per process
+        pid = os.getpid()
+        if self._worker is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._worker is None or self._pid != pid:
+                self._queue = queue.Queue()
+                self._pid = pid
+                self._worker = threading.Thread(target=self._run, name=f'micro-batcher-{self.name}', daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                predictions = self.predict_fn(np.array([pending.row for pending in batch], dtype=np.float64))
+            except Exception as e:
+                if len(batch) > 1:
+                    failed = self._run_rows(batch)
+                else:
+                    batch[0].future.set_exception(e)
+                    failed = 1
+            else:
+                for i, pending in enumerate(batch):
+                    pending.future.set_result(predictions[i:i + 1])
+                failed = 0
+            self._record(batch, started, failed)
+
+    def _run_rows(self, batch):
+        # One bad row (e.g. NaN) must not fail the callers it happened to be batched with
+        failed = 0
+        for pending in batch:
+            try:
+                pending.future.set_result(self.predict_fn(np.array([pending.row], dtype=np.float64)))
+            except Exception as e:
+                pending.future.set_exception(e)
+                failed += 1
+        return failed
+
+    def _record(self, batch, started, failed):
+        size = len(batch)
+        with self._lock:
+            self._batches += 1
+            self._rows += size
+            self._errors += failed
+            bucket = 1 << (size - 1).bit_length()
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+            for pending in batch:
+                wait = started - pending.enqueued
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                wait_ms = wait * 1000.0
+                for i, bound in enumerate(WAIT_BUCKETS_MS):
+                    if wait_ms <= bound:
+                        self._wait_counts[i] += 1
+                        break
+                else:
+                    self._wait_counts[-1] += 1
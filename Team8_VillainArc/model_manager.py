@@ -0,0 +1,304 @@
+"""Hot-swappable production models.
+
+A ModelManager stands in for a loaded model: predict() and predict_one()
+go to whichever version is active. A background thread polls the model's
+manifest (or the legacy joblib file) and, when it changes, loads the new
+artifact, scores it on the validation CSV's reserved hold-out rows and
+swaps it in with a single reference assignment. Requests already running
+finish on the version they started with, so nothing fails during a swap.
+The replaced version is kept for rollback().
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from metrics import record_inference
+from model_registry import (DEFAULT_MODEL_DIR, FLAT_SUFFIX, file_fingerprint, published_artifact, read_manifest,
+                            registry, resolve_model_path, source_signature, write_manifest)
+from train import HOLDOUT_DATA, MODELS, evaluate, holdout_mask, load_training_data
+
+logger = logging.getLogger(__name__)
+# Metric a candidate is judged on: R^2 for the regressor, accuracy for the classifier
+SCORE_METRIC = {'power': 'r2', 'stability': 'accuracy'}
+
+
+class ModelRejected(Exception):
+    pass
+
+
+class _Version:
+    __slots__ = ('version', 'path', 'engine', 'source', 'metrics', 'loaded_at')
+
+    def __init__(self, version, path, engine, source, metrics):
+        self.version = version
+        self.path = path
+        self.engine = engine
+        self.source = source
+        self.metrics = metrics
+        self.loaded_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    def describe(self):
+        return {'version': self.version, 'path': self.path, 'metrics': self.metrics, 'loaded_at': self.loaded_at}
+
+
+class ModelManager:
+    """Serve one named model and replace it when a new version is published.
+
+    kind is a train.py model ('power' or 'stability'). A candidate is rejected
+    when it fails to load, predicts non-finite values, scores below min_score
+    or more than max_regression below the active version on the hold-out
+    sample. poll_interval=None disables the watcher; reload() and rollback()
+    still work, e.g. from an admin endpoint. With lazy=True nothing is read
+    until load() or the first prediction.
+    """
+
+    def __init__(self, kind, model_dir=DEFAULT_MODEL_DIR, holdout_path=None, holdout_size=2000,
+                 min_score=None, max_regression=0.02, poll_interval=10.0, lazy=False):
+        self.kind = kind
+        self.name = MODELS[kind]['name']
+        self.model_dir = model_dir
+        self.holdout_path = holdout_path or HOLDOUT_DATA[kind]
+        self.holdout_size = holdout_size
+        self.min_score = min_score
+        self.max_regression = max_regression
+        self.poll_interval = poll_interval
+
+        # Reentrant: reload() may trigger the first load()
+        self._swap_lock = threading.RLock()
+        self._holdout = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.previous = None
+        self.last_error = None
+        self.reloads = 0
+        self.rejections = 0
+        self._seen = None
+        self._active = None
+
+        # poll_interval may still be set before load(); _start_watcher() does nothing without one
+        os.register_at_fork(after_in_child=self._start_watcher)
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Load the published version unless one is already active; returns the active version."""
+        with self._swap_lock:
+            if self._active is None:
+                # The first version is trusted as-is: refusing to start would be worse than serving it
+                path, manifest = published_artifact(self.name, self.model_dir)
+                self._seen = self._source(path)
+                self._active = self._load(path, manifest, self._seen)
+                self._start_watcher()
+            return self._active
+
+    @property
+    def loaded(self):
+        return self._active is not None
+
+    # ********************************** Serving **********************************
+    @property
+    def active(self):
+        return self._active or self.load()
+
+    @property
+    def version(self):
+        return self.active.version
+
+    @property
+    def engine(self):
+        return self.active.engine
+
+    def predict(self, X):
+        record_inference(self.kind, len(X))
+        return self.active.engine.predict(X)
+
+    def predict_one(self, row):
+        record_inference(self.kind, 1)
+        return self.active.engine.predict_one(row)
+
+    def predict_quantiles(self, X, quantiles):
+        record_inference(self.kind, len(X))
+        return self.active.engine.predict_quantiles(X, quantiles)
+
+    def predict_quantiles_one(self, row, quantiles):
+        record_inference(self.kind, 1)
+        return self.active.engine.predict_quantiles_one(row, quantiles)
+
+    def status(self):
+        return {
+            'name': self.name,
+            'active': self.active.describe(),
+            'previous': self.previous.describe() if self.previous else None,
+            'reloads': self.reloads,
+            'rejections': self.rejections,
+            'last_error': self.last_error,
+        }
+
+    # ********************************** Reload and rollback **********************************
+    def reload(self, force=False):
+        """Load, validate and activate the published version; returns True when it was swapped in.
+
+        Raises ModelRejected when the candidate fails validation.
+        """
+        path, manifest = published_artifact(self.name, self.model_dir)
+        source = self._source(path)
+        with self._swap_lock:
+            self._seen = source
+            if not force and source == self.active.source:
+                return False
+            try:
+                candidate = self._load(path, manifest, source)
+                self._validate(candidate)
+            except Exception as e:
+                self.rejections += 1
+                self.last_error = f'{os.path.basename(path)}: {e}'
+                if isinstance(e, ModelRejected):
+                    raise
+                raise ModelRejected(self.last_error) from e
+            self._activate(candidate)
+            self.last_error = None
+            return True
+
+    def rollback(self):
+        """Swap the previous version back in; it stays active until a newer version is published."""
+        with self._swap_lock:
+            if self.previous is None:
+                raise ModelRejected('No previous version to roll back to.')
+            self._activate(self.previous)
+
+    def _activate(self, candidate):
+        retired = self.previous
+        self.previous, self._active = self.active, candidate
+        self.reloads += 1
+        if retired is not None and retired.path not in (self.active.path, self.previous.path):
+            registry.discard(retired.path)
+
+    # ********************************** Loading and validation **********************************
+    def _source(self, path):
+        manifest_path = os.path.join(self.model_dir, f'{self.name}.json')
+        watched = manifest_path if os.path.exists(manifest_path) else path
+        try:
+            return (path, source_signature(watched))
+        except OSError:
+            return (path, None)
+
+    def _load(self, path, manifest, source):
+        # manifest is the one path was resolved from, so the version label always matches the artifact
+        if manifest is not None:
+            version, metrics = str(manifest['version']), manifest.get('metrics')
+        else:
+            version, metrics = (file_fingerprint(path) or 'missing')[:12], None
+        return _Version(version, path, registry.load(path), source, metrics)
+
+    def holdout(self):
+        if self._holdout is None:
+            X, y = load_training_data(self.kind, self.holdout_path)
+            # Only the rows train.py leaves out, so a candidate is not scored on its own training data
+            reserved = holdout_mask(self.kind, self.holdout_path, len(X))
+            if reserved is not None:
+                X, y = X[reserved], y[reserved]
+            if len(X) > self.holdout_size:
+                rows = np.linspace(0, len(X) - 1, self.holdout_size).astype(np.intp)
+                X, y = X[rows], y[rows]
+            self._holdout = (np.ascontiguousarray(X), y)
+        return self._holdout
+
+    def score(self, engine):
+        X, y = self.holdout()
+        if not np.all(np.isfinite(engine.predict(X))):
+            raise ModelRejected('Predictions are not finite.')
+        return evaluate(self.kind, engine, X, y)
+
+    def _validate(self, candidate):
+        metric = SCORE_METRIC[self.kind]
+        scores = self.score(candidate.engine)
+        score = scores[metric]
+        if not math.isfinite(score):
+            raise ModelRejected(f'Hold-out {metric} is not finite.')
+        if self.min_score is not None and score < self.min_score:
+            raise ModelRejected(f'Hold-out {metric} {score:.4f} is below the minimum {self.min_score}.')
+        baseline = self.score(self.active.engine)[metric]
+        if score < baseline - self.max_regression:
+            raise ModelRejected(f'Hold-out {metric} {score:.4f} is worse than the active {baseline:.4f}.')
+        candidate.metrics = dict(candidate.metrics or {}, holdout=scores)
+
+    # ********************************** Watcher **********************************
+    def _start_watcher(self):
+        # Threads do not survive fork, so pre-forked workers start their own after the fork
+        if not self.poll_interval or self._active is None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name=f'{self.name}-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                path = resolve_model_path(self.name, self.model_dir)
+                # A version that was rejected or rolled back away from is not retried until it changes again
+                if self._source(path) != self._seen:
+                    self.reload()
+            except ModelRejected as e:
+                logger.warning('%s: published version rejected: %s', self.name, e)
+            except Exception as e:
+                # Logged once per distinct failure rather than on every poll
+                error = f'watcher: {e}'
+                if error != self.last_error:
+                    logger.exception('%s: checking for a new version failed', self.name)
+                self.last_error = error
+
+    def close(self):
+        self._stop.set()
+
+
+# ********************************** Command line **********************************
+def published_versions(name, model_dir=DEFAULT_MODEL_DIR):
+    """Training reports of every published version of a model, oldest first."""
+    reports = []
+    for path in sorted(glob.glob(os.path.join(model_dir, f'{name}-*.json'))):
+        with open(path) as f:
+            reports.append(json.load(f))
+    return reports
+
+
+def promote(kind, version, model_dir=DEFAULT_MODEL_DIR):
+    """Point the manifest at an already published version; every worker's watcher picks it up."""
+    name = MODELS[kind]['name']
+    # Compressed variants from compress.py are published as FlatForest files
+    artifact = next((f'{name}-{version}{suffix}' for suffix in (FLAT_SUFFIX, '.joblib')
+                     if os.path.exists(os.path.join(model_dir, f'{name}-{version}{suffix}'))), None)
+    if artifact is None:
+        raise SystemExit(f'{name}-{version} is not published in {model_dir}.')
+    report = next((r for r in published_versions(name, model_dir) if r['version'] == version), {})
+    write_manifest(name, {'name': name, 'version': version, 'artifact': artifact, 'metrics': report.get('metrics')},
+                   model_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List or promote published model versions.')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    listing = commands.add_parser('list', help='published versions, the current one marked with *')
+    listing.add_argument('model', choices=sorted(MODELS))
+    promoting = commands.add_parser('promote', help='make a published version current, e.g. to roll back')
+    promoting.add_argument('model', choices=sorted(MODELS))
+    promoting.add_argument('version')
+    args = parser.parse_args(argv)
+
+    name = MODELS[args.model]['name']
+    if args.command == 'promote':
+        promote(args.model, args.version, args.model_dir)
+    current = (read_manifest(name, args.model_dir) or {}).get('version')
+    for report in published_versions(name, args.model_dir):
+        marker = '*' if report['version'] == current else ' '
+        print(f"{marker} {report['version']}  {json.dumps(report.get('metrics'))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Load each model once per process and share its arrays across workers.
+
+Flattenable models are exported once to an uncompressed FlatForest file in
+the model cache and then memory-mapped read-only. Every prefork worker maps
+the same file, so the forest lives in the shared page cache instead of in
+each worker's private heap, and a warm start is just an mmap.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from flat_forest import EstimatorAdapter, FlatForest
+
+# Legacy <name>.joblib files sit next to the code, wherever the app is started from
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(PACKAGE_DIR, 'instance', 'model_cache')
+# Versioned artifacts published by train.py, with a <name>.json manifest pointing at the current one
+DEFAULT_MODEL_DIR = os.path.join(PACKAGE_DIR, 'instance', 'models')
+# Files already in FlatForest.save() format: cache exports and compress.py variants
+FLAT_SUFFIX = '.flat.joblib'
+
+
+def read_manifest(name, model_dir=DEFAULT_MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, f'{name}.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(name, manifest, model_dir=DEFAULT_MODEL_DIR):
+    # Written aside and renamed, so readers see either the old manifest or the new one
+    path = os.path.join(model_dir, f'{name}.json')
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def published_artifact(name, model_dir=DEFAULT_MODEL_DIR):
+    """(path, manifest) from one manifest read; the manifest is None for the legacy <name>.joblib."""
+    manifest = read_manifest(name, model_dir)
+    if manifest is not None:
+        return os.path.join(model_dir, manifest['artifact']), manifest
+    return os.path.join(PACKAGE_DIR, f'{name}.joblib'), None
+
+
+def resolve_model_path(name, model_dir=DEFAULT_MODEL_DIR):
+    """Path of the current published version of a model, else the legacy <name>.joblib in the package."""
+    return published_artifact(name, model_dir)[0]
+
+
+def new_version(name, model_dir=DEFAULT_MODEL_DIR, label=None):
+    """UTC timestamp version with microseconds, never one a file in model_dir already uses."""
+    while True:
+        version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        if label:
+            version = f'{version}-{label}'
+        if not glob.glob(os.path.join(model_dir, f'{name}-{glob.escape(version)}.*')):
+            return version
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+_fingerprints = {}
+
+
+def file_fingerprint(path):
+    """SHA-256 of a model file, re-hashed only when its size or mtime changes."""
+    try:
+        signature = source_signature(path)
+    except OSError:
+        return None
+    key = os.path.abspath(path)
+    cached = _fingerprints.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _fingerprints[key] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, mmap_mode='r'):
+        self.cache_dir = cache_dir
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def cache_path(self, path):
+        # Keyed on the full path: app.py's static/models copy must not overwrite app1.py's export
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f'{name}-{digest}{FLAT_SUFFIX}')
+
+    def get(self, path):
+        """Return the predict/predict_one engine for a joblib model file."""
+        key = os.path.abspath(path)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._models[key] = self._load(key)
+        return model
+
+    def load(self, path):
+        """Like get(), but re-reads the file even when this process already holds it."""
+        key = os.path.abspath(path)
+        model = self._load(key)
+        with self._lock:
+            self._models[key] = model
+        return model
+
+    def discard(self, path):
+        # Callers still holding the engine keep using it; the mapping is released with the last reference
+        with self._lock:
+            self._models.pop(os.path.abspath(path), None)
+
+    def _load(self, path):
+        if path.endswith(FLAT_SUFFIX):
+            return FlatForest.load(path, self.mmap_mode)
+        signature = source_signature(path)
+        cached = self.cache_path(path)
+        if os.path.exists(cached):
+            forest = FlatForest.load(cached, self.mmap_mode)
+            if forest.metadata.get('source') == signature:
+                return forest
+
+        import joblib
+
+        model = joblib.load(path)
+        try:
+            forest = FlatForest.from_sklearn(model)
+        except TypeError:
+            return EstimatorAdapter(model)
+        del model
+
+        # Publish atomically: concurrent workers may export the same model at once
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f'{cached}.{os.getpid()}.tmp'
+        forest.save(tmp, source=signature)
+        os.replace(tmp, cached)
+        return FlatForest.load(cached, self.mmap_mode)
+
+
+registry = ModelRegistry()
@@ -0,0 +1,54 @@
+"""Weather-to-grid-stability pipeline over whole batches.
+
+Predicts PowerGen from the weather columns, splits it across the three grid
+nodes the same way /result does (20/45/35) and classifies stability from
+c1..c3, p1..p3 and the derived power columns. Every step is a column-wise
+NumPy operation, so the cost per row is a share of two model calls.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from batch_predict import DEFAULT_CHUNK_SIZE, WEATHER_FEATURES, predict_batch
+
+GRID_FEATURES = ['c1', 'c2', 'c3', 'p1', 'p2', 'p3']
+PIPELINE_FEATURES = WEATHER_FEATURES + GRID_FEATURES
+
+# Share of PowerGen delivered to each node, as in predict_result()
+NODE_SPLITS = (0.20, 0.45, 0.35)
+
+
+def parse_grid_timestamp(date, time):
+    """Parse the date/time columns of grid_stability_*.csv.
+
+    Dates are day-first but mix 1/2/2024 and 13-02-2024 spellings.
+    """
+    return datetime.strptime(f'{date.replace("-", "/")} {time}', '%d/%m/%Y %H:%M:%S')
+
+
+def node_power(power_gen):
+    return np.column_stack([power_gen * share for share in NODE_SPLITS])
+
+
+def stability_features(grid, power_gen):
+    """Assemble the 10-column input of the stability model: c1..p3, PowerGen, power_gen1..3."""
+    return np.column_stack([grid, power_gen, node_power(power_gen)])
+
+
+def predict_grid(power_model, stability_model, X, chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=None):
+    """Run both models over an (n, 9) AirTemp..WindSpeed, c1..p3 matrix."""
+    X = np.asarray(X, dtype=np.float64)
+    weather = X[:, :len(WEATHER_FEATURES)]
+    grid = X[:, len(WEATHER_FEATURES):]
+
+    power_gen = predict_batch(power_model, weather, chunk_size, n_jobs)
+    features = stability_features(grid, power_gen)
+    stability = predict_batch(stability_model, features, chunk_size, n_jobs)
+
+    return {
+        'PowerGen': power_gen,
+        'power_gen1': features[:, 7],
+        'power_gen2': features[:, 8],
+        'power_gen3': features[:, 9],
+        'stability': np.where(stability == 1, 'Stable', 'Unstable'),
+    }
@@ -0,0 +1,136 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Rough per-entry overhead of the OrderedDict slot and the (value, expiry) pair
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """Thread-safe LRU/TTL cache of predictions keyed on the input feature tuple.
+
+    quantize gives a step per feature (None or 0 keeps the exact value), so
+    inputs that only differ below that resolution share one entry. When a
+    fingerprint callable is given it is polled every check_interval seconds
+    and the cache empties itself whenever the returned value changes, e.g.
+    when the model file's hash changes. ttl=None keeps entries until they are
+    evicted; ttl=0 disables the cache, so every lookup computes.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, quantize=None, max_bytes=None,
+                 fingerprint=None, check_interval=5.0, name='cache'):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self.quantize = tuple(quantize) if quantize else None
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self.check_interval = check_interval
+        self.name = name
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bumped by clear(), so results computed before an invalidation are not stored after it
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._current_fingerprint = fingerprint() if fingerprint else None
+        self._next_check = time.monotonic() + check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, row):
+        if self.quantize is None:
+            return tuple(float(value) for value in row)
+        return tuple(round(float(value) / step) if step else float(value)
+                     for value, step in zip(row, self.quantize))
+
+    # ********************************** Lookups **********************************
+    def get(self, row):
+        if self.ttl == 0:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._check_fingerprint()
+        key = self.key(row)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, _ = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, row, value, generation=None):
+        """Store value; dropped when generation is given and the cache was cleared since."""
+        if self.ttl == 0:
+            return
+        key = self.key(row)
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, row, compute):
+        value = self.get(row)
+        if value is None:
+            # A model swap during compute clears the cache; the old model's result must not outlive it
+            generation = self._generation
+            value = compute(row)
+            self._check_fingerprint()
+            self.put(row, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    # ********************************** Internals **********************************
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_fingerprint(self):
+        if self.fingerprint is None or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        current = self.fingerprint()
+        if current != self._current_fingerprint:
+            self._current_fingerprint = current
+            self.clear()
+            self.invalidations += 1
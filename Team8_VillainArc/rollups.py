@@ -0,0 +1,267 @@
+"""Daily, weekly and monthly dashboard rollups maintained incrementally.
+
+Each bucket stores running sums, counts and extremes rather than final
+statistics, so rows appended to a source CSV are folded in by reading only
+the bytes past the offset recorded for that file. Nothing is recomputed
+unless a source shrinks or its header changes. Summaries are rendered to
+JSON once per store version and served with an ETag.
+
+    python rollups.py update ../Data/wind_power_gen_5years_training_data.csv ../Data/grid_stability_3months_validation_data.csv
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from pipeline import parse_grid_timestamp
+from timeseries_store import DEFAULT_PATH, connect
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data')
+DEFAULT_SOURCES = [
+    os.path.join(DATA_DIR, 'wind_power_gen_5years_training_data.csv'),
+    os.path.join(DATA_DIR, 'wind_power_gen_3months_validation_data.csv'),
+    os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+]
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    power_sum REAL NOT NULL DEFAULT 0,
+    power_min REAL,
+    power_max REAL,
+    wind_sum REAL NOT NULL DEFAULT 0,
+    wind_min REAL,
+    wind_max REAL,
+    stability_rows INTEGER NOT NULL DEFAULT 0,
+    stable INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket)
+);
+CREATE TABLE IF NOT EXISTS rollup_source (
+    path TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rollup_meta (id, version) VALUES (1, 0);
+"""
+
+# Fold a batch of partial aggregates into the stored buckets
+UPSERT = """
+INSERT INTO rollup (period, bucket, rows, power_sum, power_min, power_max,
+                    wind_sum, wind_min, wind_max, stability_rows, stable)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (period, bucket) DO UPDATE SET
+    rows = rows + excluded.rows,
+    power_sum = power_sum + excluded.power_sum,
+    power_min = COALESCE(MIN(power_min, excluded.power_min), power_min, excluded.power_min),
+    power_max = COALESCE(MAX(power_max, excluded.power_max), power_max, excluded.power_max),
+    wind_sum = wind_sum + excluded.wind_sum,
+    wind_min = COALESCE(MIN(wind_min, excluded.wind_min), wind_min, excluded.wind_min),
+    wind_max = COALESCE(MAX(wind_max, excluded.wind_max), wind_max, excluded.wind_max),
+    stability_rows = stability_rows + excluded.stability_rows,
+    stable = stable + excluded.stable
+"""
+
+
+class SourceChanged(Exception):
+    pass
+
+
+def bucket_keys(day):
+    week_start = day - timedelta(days=day.weekday())
+    return (('daily', day.isoformat()), ('weekly', week_start.isoformat()), ('monthly', day.isoformat()[:7]))
+
+
+class _Accumulator:
+
+    def __init__(self):
+        self.buckets = {}
+
+    def _bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            # rows, power_sum, power_min, power_max, wind_sum, wind_min, wind_max, stability_rows, stable
+            bucket = self.buckets[key] = [0, 0.0, None, None, 0.0, None, None, 0, 0]
+        return bucket
+
+    def add_generation(self, day, power, wind):
+        for key in bucket_keys(day):
+            b = self._bucket(key)
+            b[0] += 1
+            b[1] += power
+            b[2] = power if b[2] is None else min(b[2], power)
+            b[3] = power if b[3] is None else max(b[3], power)
+            b[4] += wind
+            b[5] = wind if b[5] is None else min(b[5], wind)
+            b[6] = wind if b[6] is None else max(b[6], wind)
+
+    def add_stability(self, day, stable):
+        for key in bucket_keys(day):
+            b = self._bucket(key)
+            b[7] += 1
+            b[8] += 1 if stable else 0
+
+    def rows(self):
+        return [key + tuple(values) for key, values in self.buckets.items()]
+
+
+class RollupStore:
+
+    def __init__(self, sources=DEFAULT_SOURCES, path=DEFAULT_PATH, refresh_interval=30.0):
+        self.sources = list(sources)
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+        self._rendered = {}
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.path)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def version(self):
+        return self.connection().execute('SELECT version FROM rollup_meta').fetchone()[0]
+
+    # ********************************** Incremental updates **********************************
+    def update(self):
+        """Fold rows appended to the sources since the last update; returns the number of new rows."""
+        with self._lock:
+            try:
+                return self._update()
+            except SourceChanged:
+                self._reset()
+                return self._update()
+
+    def maybe_refresh(self):
+        if time.monotonic() >= self._next_refresh:
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            self.update()
+
+    def _reset(self):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM rollup')
+            conn.execute('DELETE FROM rollup_source')
+            conn.execute('UPDATE rollup_meta SET version = version + 1')
+
+    def _update(self):
+        conn = self.connection()
+        added = 0
+        for path in self.sources:
+            if not os.path.exists(path):
+                continue
+            # IMMEDIATE takes the write lock before reading the offset, so workers never fold a delta twice
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._fold_source(conn, path)
+                if rows:
+                    conn.execute('UPDATE rollup_meta SET version = version + 1')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            added += rows
+        return added
+
+    def _fold_source(self, conn, path):
+        stored = conn.execute('SELECT header, offset FROM rollup_source WHERE path = ?', (path,)).fetchone()
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+            header = header_line.decode('utf-8-sig').strip()
+            offset = len(header_line)
+            if stored is not None:
+                if stored[0] != header or os.fstat(f.fileno()).st_size < stored[1]:
+                    raise SourceChanged(path)
+                offset = stored[1]
+            f.seek(offset)
+            data = f.read()
+
+        # Leave a trailing partial line for the next update
+        complete = data[:data.rfind(b'\n') + 1]
+        if not complete:
+            return 0
+        columns = next(csv.reader([header]))
+        accumulator = _Accumulator()
+        rows = 0
+        for record in csv.DictReader(io.StringIO(complete.decode('utf-8')), fieldnames=columns):
+            if 'stability' in record:
+                day = parse_grid_timestamp(record['date'], record['time']).date()
+                accumulator.add_stability(day, record['stability'].strip().lower() == 'stable')
+            else:
+                day = date.fromisoformat(record['DateTime'][:10])
+                accumulator.add_generation(day, float(record['PowerGen']), float(record['WindSpeed']))
+            rows += 1
+
+        conn.executemany(UPSERT, accumulator.rows())
+        conn.execute('INSERT OR REPLACE INTO rollup_source (path, header, offset) VALUES (?, ?, ?)',
+                     (path, header, offset + len(complete)))
+        return rows
+
+    # ********************************** Serving **********************************
+    def summary(self, period):
+        if period not in PERIODS:
+            raise ValueError(f'period must be one of {", ".join(PERIODS)}.')
+        cursor = self.connection().execute(
+            'SELECT bucket, rows, power_sum, power_min, power_max, wind_sum, wind_min, wind_max, stability_rows, stable '
+            'FROM rollup WHERE period = ? ORDER BY bucket', (period,))
+        summary = []
+        for bucket, rows, power_sum, power_min, power_max, wind_sum, wind_min, wind_max, stability_rows, stable in cursor:
+            summary.append({
+                'bucket': bucket,
+                'rows': rows,
+                'power_gen_mean': power_sum / rows if rows else None,
+                'power_gen_min': power_min,
+                'power_gen_max': power_max,
+                'wind_speed_mean': wind_sum / rows if rows else None,
+                'wind_speed_min': wind_min,
+                'wind_speed_max': wind_max,
+                'stability_rows': stability_rows,
+                'stable_ratio': stable / stability_rows if stability_rows else None,
+                'unstable_ratio': (stability_rows - stable) / stability_rows if stability_rows else None,
+            })
+        return summary
+
+    def rendered(self, period):
+        """(etag, JSON bytes) for a period, re-rendered only when the store version changes."""
+        version = self.version()
+        cached = self._rendered.get(period)
+        if cached is None or cached[0] != version:
+            body = json.dumps({'period': period, 'buckets': self.summary(period)}).encode()
+            cached = self._rendered[period] = (version, hashlib.sha1(body).hexdigest(), body)
+        return cached[1], cached[2]
+
+
+# ********************************** Command line **********************************
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Update the dashboard rollups from source CSVs.')
+    parser.add_argument('--db', default=DEFAULT_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    update = commands.add_parser('update', help='fold new rows of the given (or default Data/) CSVs')
+    update.add_argument('csv', nargs='*')
+    args = parser.parse_args(argv)
+
+    store = RollupStore(args.csv or DEFAULT_SOURCES, args.db)
+    start = time.perf_counter()
+    rows = store.update()
+    print(f'Folded {rows} new rows in {time.perf_counter() - start:.2f}s (version {store.version()})')
+
+
+if __name__ == '__main__':
+    main()
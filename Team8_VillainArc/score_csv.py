@@ -0,0 +1,153 @@
+"""Back-score a weather CSV with the production power generation model.
+
+Reads DateTime,AirTemp,Pressure,WindSpeed rows in fixed-size chunks, predicts
+PowerGen for each chunk and appends it to the output straight away, so memory
+stays flat however large the input is. With --workers N the chunks are scored
+by a process pool; each worker memory-maps the shared model, at most 2 * N
+chunks are in flight, and output keeps input order.
+
+    python score_csv.py ../Data/wind_power_gen_5years_training_data.csv scored.csv --workers 4
+    python score_csv.py archive.csv scored.parquet
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_predict import WEATHER_FEATURES, BatchInputError, iter_weather_chunks
+from model_registry import registry, resolve_model_path
+
+OUTPUT_COLUMNS = ['DateTime'] + WEATHER_FEATURES + ['PredictedPowerGen']
+
+_worker_model = None
+
+
+# ********************************** Scoring **********************************
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = registry.get(model_path)
+
+
+def _score(X):
+    return _worker_model.predict(X)
+
+
+def parse_datetimes(timestamps, rows):
+    if timestamps is None:
+        return np.full(rows, np.datetime64('NaT'), dtype='datetime64[s]')
+    try:
+        return np.array(timestamps, dtype='datetime64[s]')
+    except ValueError as e:
+        raise BatchInputError(f'Unparseable DateTime value: {e}')
+
+
+def score_chunks(chunks, model_path, workers=1):
+    """Yield (datetimes, X, predictions) for each input chunk, in input order."""
+    if workers <= 1:
+        _init_worker(model_path)
+        for timestamps, X in chunks:
+            yield parse_datetimes(timestamps, len(X)), X, _score(X)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        pending = deque()
+        for timestamps, X in chunks:
+            pending.append((parse_datetimes(timestamps, len(X)), X, pool.submit(_score, X)))
+            # Bounded read-ahead keeps memory flat when reading outpaces scoring
+            if len(pending) >= 2 * workers:
+                datetimes, X_done, future = pending.popleft()
+                yield datetimes, X_done, future.result()
+        while pending:
+            datetimes, X_done, future = pending.popleft()
+            yield datetimes, X_done, future.result()
+
+
+# ********************************** Output writers **********************************
+class CsvOutput:
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, datetimes, X, predictions):
+        text_times = np.char.replace(np.datetime_as_string(datetimes, unit='s'), 'T', ' ')
+        text_times[np.isnat(datetimes)] = ''
+        self.writer.writerows(
+            [timestamp, *row, prediction]
+            for timestamp, row, prediction in zip(text_times.tolist(), X.tolist(), predictions.tolist()))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetOutput:
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit('Parquet output needs pyarrow: pip install pyarrow')
+        self.pa = pa
+        self.schema = pa.schema([('DateTime', pa.timestamp('s'))] +
+                                [(name, pa.float64()) for name in OUTPUT_COLUMNS[1:]])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, datetimes, X, predictions):
+        columns = [self.pa.array(datetimes, mask=np.isnat(datetimes))]
+        columns += [self.pa.array(X[:, i]) for i in range(X.shape[1])]
+        columns.append(self.pa.array(predictions))
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_output(path, output_format=None):
+    output_format = output_format or ('parquet' if path.endswith('.parquet') else 'csv')
+    return ParquetOutput(path) if output_format == 'parquet' else CsvOutput(path)
+
+
+# ********************************** Command line **********************************
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Back-score a weather CSV with the power generation model.')
+    parser.add_argument('input', help='CSV with DateTime,AirTemp,Pressure,WindSpeed columns')
+    parser.add_argument('output', help='.csv or .parquet file to write')
+    parser.add_argument('--model', default=resolve_model_path('final_power_gen_model'),
+                        help='default: the published version')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=1, help='scoring processes (0 = all cores)')
+    parser.add_argument('--format', choices=['csv', 'parquet'])
+    args = parser.parse_args(argv)
+    workers = args.workers or os.cpu_count()
+
+    # Export the mmap cache once here rather than in every worker
+    registry.get(args.model)
+
+    start = time.perf_counter()
+    rows = 0
+    output = open_output(args.output, args.format)
+    try:
+        with open(args.input, newline='') as f:
+            chunks = iter_weather_chunks(f, args.chunk_size)
+            for datetimes, X, predictions in score_chunks(chunks, args.model, workers):
+                output.write(datetimes, X, predictions)
+                rows += len(predictions)
+    except BatchInputError as e:
+        raise SystemExit(f'{args.input}: {e}')
+    finally:
+        output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f'Scored {rows} rows into {args.output} in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s, {workers} worker(s))',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
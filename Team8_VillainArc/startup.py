@@ -0,0 +1,95 @@
+"""Startup profile of app1.py: imports, database setup, model loads.
+
+app1 creates a StartupProfile before its other imports and records each
+warm-up phase in it; the result is logged once the app is ready and served
+on /ready. For per-module import times run this file: it imports app1 and
+calls create_app() in a fresh interpreter under -X importtime, then prints
+the slowest modules followed by the phase timings.
+
+    python startup.py --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StartupProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_ms = None
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record name as the time from the start of the profile until now."""
+        with self._lock:
+            self.phases[name] = (time.perf_counter() - self.started) * 1000
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = (time.perf_counter() - started) * 1000
+
+    def ready(self):
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+
+    def report(self):
+        with self._lock:
+            return {'phases_ms': dict(self.phases), 'ready_ms': self.ready_ms}
+
+
+# ********************************** Command line **********************************
+def parse_importtime(stderr):
+    """(module, depth, self us, cumulative us) per line of -X importtime output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(own), int(cumulative)))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the startup of app1.py in a fresh interpreter.')
+    parser.add_argument('--top', type=int, default=20, help='slowest modules to list')
+    args = parser.parse_args(argv)
+
+    code = 'import json, app1; app1.create_app(); print(json.dumps(app1.startup_profile.report()))'
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PACKAGE_DIR,
+                            capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(result.returncode)
+
+    # Depth 0 is app1 itself and whatever warm-up imported lazily, depth 1 what app1 imports directly
+    entries = [entry for entry in parse_importtime(result.stderr) if entry[1] <= 1]
+    print(f'{"module":<40}{"cumulative ms":>15}{"self ms":>10}')
+    for name, depth, own, cumulative in sorted(entries, key=lambda entry: -entry[3])[:args.top]:
+        print(f'{"  " * depth + name:<40}{cumulative / 1000:15.1f}{own / 1000:10.1f}')
+
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    print()
+    for name, ms in profile['phases_ms'].items():
+        print(f'{name:<40}{ms:15.1f}')
+    print(f'{"ready":<40}{profile["ready_ms"]:15.1f}')
+    print(f'{"process wall time":<40}{wall_ms:15.1f}')
+
+
+if __name__ == '__main__':
+    main()
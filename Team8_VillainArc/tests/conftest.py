@@ -0,0 +1,30 @@
+"""Shared fixtures. Run from Team8_VillainArc:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def models_available():
+    from model_registry import resolve_model_path
+    from train import MODELS
+
+    return all(os.path.exists(resolve_model_path(spec['name'])) for spec in MODELS.values())
+
+
+@pytest.fixture(scope='session')
+def app1(tmp_path_factory):
+    """app1 after create_app(), on a scratch database; the module is a per-process singleton, so tests share it."""
+    if not models_available():
+        pytest.skip('the production model files are not available')
+    with pytest.MonkeyPatch.context() as patch:
+        # Only read when app1 is imported
+        patch.setenv('SUSTAINAWATT_DATABASE_URI', f'sqlite:///{tmp_path_factory.mktemp("db") / "app1.db"}')
+        import app1
+    app1.create_app()
+    return app1
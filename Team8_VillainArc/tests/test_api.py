@@ -0,0 +1,30 @@
+"""The /api/v1 endpoints as served by app1.py after create_app()."""
+import pytest
+
+
+@pytest.fixture
+def client(app1):
+    return app1.app.test_client()
+
+
+def test_power_flags_out_of_range_input(client):
+    response = client.post('/api/v1/power', json={'AirTemp': 15.0, 'Pressure': 1013.0, 'WindSpeed': 8.0})
+    assert response.status_code == 200
+    assert response.get_json()['out_of_range'] == ['Pressure']
+    assert response.headers['X-Input-Out-Of-Range'] == 'Pressure'
+
+
+def test_power_in_range_input_is_not_flagged(client):
+    response = client.post('/api/v1/power', json={'AirTemp': 15.0, 'Pressure': 1.0, 'WindSpeed': 8.0})
+    assert response.status_code == 200
+    assert 'out_of_range' not in response.get_json()
+    assert 'X-Input-Out-Of-Range' not in response.headers
+
+
+def test_non_finite_form_values_are_rejected(client):
+    form = {'c1': 'nan', 'c2': 1, 'c3': 1, 'p1': 1, 'p2': 1, 'p3': 1, 'PowerGen': 50}
+    response = client.post('/result', data=form, headers={'Accept': 'application/json'})
+    assert response.status_code == 422
+    assert response.get_json() == {'error': 'c1 must be finite.'}
+    response = client.post('/predict', data={'air_temperature': 'inf', 'pressure': 1, 'wind_speed': 5})
+    assert response.status_code == 400
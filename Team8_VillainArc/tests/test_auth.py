@@ -0,0 +1,83 @@
+from auth import PasswordHasher, SessionCache, hash_fingerprint, is_hashed, validate_session
+
+# Cheap work factors keep the tests fast; only the method strings matter here
+METHOD = 'pbkdf2:sha256:1000'
+OLD_METHOD = 'pbkdf2:sha256:500'
+
+
+def test_hash_verifies():
+    hasher = PasswordHasher(METHOD)
+    stored = hasher.hash('Secret@123')
+    assert is_hashed(stored)
+    assert hasher.verify(stored, 'Secret@123') == (True, False)
+    assert hasher.verify(stored, 'wrong') == (False, False)
+
+
+def test_plaintext_password_needs_rehash():
+    hasher = PasswordHasher(METHOD)
+    assert hasher.verify('Secret@123', 'Secret@123') == (True, True)
+    assert hasher.verify('Secret@123', 'wrong')[0] is False
+
+
+def test_older_method_needs_rehash_only_when_it_matches():
+    stored = PasswordHasher(OLD_METHOD).hash('Secret@123')
+    hasher = PasswordHasher(METHOD)
+    assert hasher.verify(stored, 'Secret@123') == (True, True)
+    assert hasher.verify(stored, 'wrong') == (False, False)
+
+
+class Users:
+
+    def __init__(self, **passwords):
+        self.passwords = passwords
+        self.lookups = 0
+
+    def fingerprint(self, user_id):
+        self.lookups += 1
+        if user_id not in self.passwords:
+            return None
+        return user_id, hash_fingerprint(self.passwords[user_id])
+
+
+def signed_in(user_id, stored):
+    return {'user_id': user_id, 'auth': hash_fingerprint(stored)}
+
+
+def test_valid_session_is_cached():
+    users = Users(alice='hash-1')
+    cache = SessionCache(ttl=60)
+    session = signed_in('alice', 'hash-1')
+    assert validate_session(session, cache, users.fingerprint) == 'alice'
+    assert validate_session(session, cache, users.fingerprint) == 'alice'
+    assert users.lookups == 1
+
+
+def test_password_change_signs_other_sessions_out():
+    users = Users(alice='hash-1')
+    cache = SessionCache(ttl=60)
+    session = signed_in('alice', 'hash-1')
+    users.passwords['alice'] = 'hash-2'
+    assert validate_session(session, cache, users.fingerprint) is None
+    assert session == {}
+
+
+def test_deleted_user_is_signed_out():
+    users = Users()
+    session = signed_in('alice', 'hash-1')
+    assert validate_session(session, SessionCache(), users.fingerprint) is None
+    assert session == {}
+
+
+def test_signed_out_session_skips_the_database():
+    users = Users(alice='hash-1')
+    assert validate_session({}, SessionCache(), users.fingerprint) is None
+    assert users.lookups == 0
+
+
+def test_cached_validation_expires():
+    users = Users(alice='hash-1')
+    cache = SessionCache(ttl=0)
+    session = signed_in('alice', 'hash-1')
+    validate_session(session, cache, users.fingerprint)
+    users.passwords['alice'] = 'hash-2'
+    assert validate_session(session, cache, users.fingerprint) is None
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from flat_forest import FlatForest, quantile_name
+
+pytest.importorskip('sklearn')
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3))
+    y = X[:, 0] * 2.0 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=400)
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def regressor(data):
+    X, y = data
+    return RandomForestRegressor(n_estimators=12, max_depth=8, random_state=0).fit(X, y)
+
+
+def test_predict_matches_sklearn(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    assert np.array_equal(forest.predict(X), regressor.predict(X))
+
+
+def test_predict_one_matches_sklearn(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    for row in X[:25]:
+        assert np.array_equal(forest.predict_one(row), regressor.predict(row[np.newaxis]))
+
+
+def test_classifier_matches_sklearn(data):
+    X, y = data
+    model = RandomForestClassifier(n_estimators=8, max_depth=6, random_state=0).fit(X, y > 0)
+    forest = FlatForest.from_sklearn(model)
+    assert np.array_equal(forest.predict(X), model.predict(X))
+    assert np.array_equal(forest.predict_one(X[0]), model.predict(X[:1]))
+
+
+def test_quantile_mean_equals_predict(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    summary = forest.predict_quantiles(X, (0.1, 0.5, 0.9))
+    assert np.array_equal(summary['mean'], forest.predict(X))
+    assert np.all(summary[quantile_name(0.1)] <= summary[quantile_name(0.9)])
+    one = forest.predict_quantiles_one(X[0], (0.1, 0.5, 0.9))
+    assert np.array_equal(one['mean'], forest.predict(X[:1]))
+
+
+def test_non_finite_input_is_rejected(regressor):
+    forest = FlatForest.from_sklearn(regressor)
+    with pytest.raises(ValueError, match='NaN or infinity'):
+        forest.predict([[np.nan, 0.0, 0.0]])
+
+
+def test_prune_trees_matches_smaller_forest(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    pruned = forest.prune(n_trees=5)
+    expected = np.mean([tree.predict(X.astype(np.float32)) for tree in regressor.estimators_[:5]], axis=0)
+    assert pruned.n_trees == 5
+    assert np.allclose(pruned.predict(X), expected)
+
+
+def test_prune_depth_cuts_trees(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    shallow = forest.prune(max_depth=2)
+    assert shallow.depths().max() <= 2
+    assert shallow.n_nodes < forest.n_nodes
+    # A depth-2 tree has at most four leaves
+    assert all(len(np.unique(leaves)) <= 4 for leaves in shallow.apply(X).T)
+
+
+def test_astype_float32_keeps_every_split(regressor, data):
+    X, _ = data
+    forest = FlatForest.from_sklearn(regressor)
+    small = forest.astype(np.float32)
+    assert small.threshold.dtype == np.float32
+    assert np.array_equal(small.apply(X), forest.apply(X))
+    assert np.allclose(small.predict(X), forest.predict(X), rtol=1e-6)
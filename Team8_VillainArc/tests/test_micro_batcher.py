@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class RowSums:
+    """Fails a whole call when any row is NaN, like FlatForest does."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, X):
+        with self.lock:
+            self.calls.append(len(X))
+        if np.isnan(X).any():
+            raise ValueError('Input X contains NaN or infinity.')
+        return X.sum(axis=1)
+
+
+def test_rows_are_scored_together():
+    predict = RowSums()
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit([i, 1.0]) for i in range(8)]
+    assert [float(f.result(5)[0]) for f in futures] == [i + 1.0 for i in range(8)]
+    assert predict.calls == [8]
+
+
+def test_bad_row_fails_alone():
+    predict = RowSums()
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=200)
+    rows = [[1.0, 1.0], [2.0, 2.0], [np.nan, 0.0], [3.0, 3.0]]
+    futures = [batcher.submit(row) for row in rows]
+
+    with pytest.raises(ValueError):
+        futures[2].result(5)
+    assert [float(futures[i].result(5)[0]) for i in (0, 1, 3)] == [2.0, 4.0, 6.0]
+    # One batch call that failed, then one call per row
+    assert predict.calls == [4, 1, 1, 1, 1]
+    stats = batcher.stats()
+    assert stats['errors'] == 1
+    assert stats['rows'] == 4
+
+
+def test_predict_keeps_model_output_shape():
+    batcher = MicroBatcher(RowSums(), max_wait_ms=0)
+    assert batcher.predict([1.0, 2.0], timeout=5).shape == (1,)
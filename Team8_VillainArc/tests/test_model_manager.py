@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+import joblib  # noqa: E402
+from sklearn.ensemble import RandomForestRegressor  # noqa: E402
+
+import model_manager  # noqa: E402
+from model_manager import ModelManager, ModelRejected  # noqa: E402
+from model_registry import ModelRegistry, write_manifest  # noqa: E402
+
+NAME = 'final_power_gen_model'
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Model dir, hold-out CSV and a publish(version, model) helper; flat-model exports stay in tmp_path."""
+    monkeypatch.setattr(model_manager, 'registry', ModelRegistry(str(tmp_path / 'cache')))
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.0, 1.0, size=(300, 3))
+    y = 10.0 * X[:, 2] + X[:, 0]
+    holdout = tmp_path / 'holdout.csv'
+    holdout.write_text('AirTemp,Pressure,WindSpeed,PowerGen\n' +
+                       ''.join(f'{a},{p},{w},{t}\n' for (a, p, w), t in zip(X, y)))
+    model_dir = tmp_path / 'models'
+    model_dir.mkdir()
+
+    def publish(version, target):
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, target)
+        artifact = f'{NAME}-{version}.joblib'
+        joblib.dump(model, model_dir / artifact)
+        write_manifest(NAME, {'name': NAME, 'version': version, 'artifact': artifact, 'metrics': None},
+                       str(model_dir))
+
+    publish.good_target = y
+    publish.bad_target = rng.permutation(y)
+    return str(model_dir), str(holdout), publish
+
+
+def manager(model_dir, holdout):
+    return ModelManager('power', model_dir=model_dir, holdout_path=holdout, poll_interval=None)
+
+
+def test_better_version_is_swapped_in(workspace):
+    model_dir, holdout, publish = workspace
+    publish('v1', publish.good_target)
+    m = manager(model_dir, holdout)
+    assert m.version == 'v1'
+    publish('v2', publish.good_target)
+    assert m.reload() is True
+    assert m.version == 'v2'
+    assert m.previous.version == 'v1'
+    assert m.reload() is False
+
+
+def test_regressing_version_is_rejected_then_rollback(workspace):
+    model_dir, holdout, publish = workspace
+    publish('v1', publish.good_target)
+    m = manager(model_dir, holdout)
+    publish('v2', publish.good_target)
+    m.reload()
+
+    publish('v3', publish.bad_target)
+    with pytest.raises(ModelRejected, match='worse than the active'):
+        m.reload()
+    assert m.version == 'v2'
+    assert m.rejections == 1
+    assert 'v3' in m.last_error
+
+    m.rollback()
+    assert m.version == 'v1'
+    assert m.previous.version == 'v2'
+    predictions = m.predict(np.array([[0.5, 0.5, 0.5]]))
+    assert predictions.shape == (1,)
+
+
+def test_rollback_without_previous_version(workspace):
+    model_dir, holdout, publish = workspace
+    publish('v1', publish.good_target)
+    with pytest.raises(ModelRejected):
+        manager(model_dir, holdout).rollback()
+
+
+def test_version_matches_the_artifact_it_was_loaded_from(workspace):
+    model_dir, holdout, publish = workspace
+    publish('v1', publish.good_target)
+    m = manager(model_dir, holdout)
+    assert os.path.basename(m.active.path) == f'{NAME}-v1.joblib'
@@ -0,0 +1,94 @@
+import time
+
+from prediction_cache import PredictionCache
+
+
+def counting(value):
+    calls = []
+
+    def compute(row):
+        calls.append(tuple(row))
+        return value
+    return compute, calls
+
+
+def test_hit_after_compute():
+    cache = PredictionCache(ttl=None)
+    compute, calls = counting(1.5)
+    assert cache.get_or_compute([1.0, 2.0], compute) == 1.5
+    assert cache.get_or_compute([1.0, 2.0], compute) == 1.5
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = PredictionCache(ttl=0.05)
+    cache.put([1.0], 'a')
+    assert cache.get([1.0]) == 'a'
+    time.sleep(0.1)
+    assert cache.get([1.0]) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_ttl_none_never_expires():
+    cache = PredictionCache(ttl=None)
+    cache.put([1.0], 'a')
+    time.sleep(0.05)
+    assert cache.get([1.0]) == 'a'
+
+
+def test_ttl_zero_disables_the_cache():
+    cache = PredictionCache(ttl=0)
+    compute, calls = counting(3.0)
+    for _ in range(3):
+        assert cache.get_or_compute([1.0], compute) == 3.0
+    assert len(calls) == 3
+    assert cache.stats()['size'] == 0
+
+
+def test_quantize_shares_entries_within_a_step():
+    cache = PredictionCache(ttl=None, quantize=(0.1, None))
+    cache.put([1.01, 5.0], 'a')
+    assert cache.get([1.04, 5.0]) == 'a'
+    assert cache.get([1.06, 5.0]) is None
+    # A step of None keeps the exact value
+    assert cache.get([1.01, 5.0001]) is None
+
+
+def test_maxsize_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2, ttl=None)
+    cache.put([1.0], 'a')
+    cache.put([2.0], 'b')
+    cache.get([1.0])
+    cache.put([3.0], 'c')
+    assert cache.get([2.0]) is None
+    assert cache.get([1.0]) == 'a'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_fingerprint_change_invalidates():
+    version = ['v1']
+    cache = PredictionCache(ttl=None, fingerprint=lambda: version[0], check_interval=0.0)
+    cache.put([1.0], 'old')
+    version[0] = 'v2'
+    assert cache.get([1.0]) is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_result_computed_before_a_clear_is_not_stored():
+    cache = PredictionCache(ttl=None)
+
+    def compute(row):
+        # The model is swapped while this row is being scored
+        cache.clear()
+        return 'old model'
+    assert cache.get_or_compute([1.0], compute) == 'old model'
+    assert cache.get([1.0]) is None
+
+
+def test_put_with_stale_generation_is_dropped():
+    cache = PredictionCache(ttl=None)
+    generation = cache._generation
+    cache.clear()
+    cache.put([1.0], 'stale', generation)
+    assert cache.get([1.0]) is None
@@ -0,0 +1,107 @@
+import pytest
+
+from rollups import PERIODS, RollupStore
+
+GENERATION_HEADER = 'DateTime,AirTemp,Pressure,WindSpeed,PowerGen\n'
+GRID_HEADER = 'date,time,c1,c2,c3,p1,p2,p3,stability,PowerGen,power_gen1,power_gen2,power_gen3\n'
+
+
+def generation_rows(days):
+    # Quarter steps add up exactly, so incremental and full sums can be compared with ==
+    return [f'2024-01-{day:02d} {hour:02d}:00:00,5.0,0.99,{hour * 0.25},{day + hour * 0.5}\n'
+            for day in days for hour in range(0, 24, 6)]
+
+
+def grid_rows(days):
+    return [f'{day}/1/2024,{hour}:00:00,0,0,0,0,0,0,{"stable" if hour % 12 else "unstable"},1,0,0,0\n'
+            for day in days for hour in range(0, 24, 6)]
+
+
+def write(path, header, rows):
+    with open(path, 'w') as f:
+        f.write(header + ''.join(rows))
+
+
+def summaries(store):
+    return {period: store.summary(period) for period in PERIODS}
+
+
+@pytest.fixture
+def sources(tmp_path):
+    return str(tmp_path / 'generation.csv'), str(tmp_path / 'grid.csv')
+
+
+def test_appending_rows_matches_a_full_rebuild(tmp_path, sources):
+    generation, grid = sources
+    write(generation, GENERATION_HEADER, generation_rows(range(1, 10)))
+    write(grid, GRID_HEADER, grid_rows(range(1, 10)))
+    incremental = RollupStore([generation, grid], str(tmp_path / 'incremental.db'))
+    assert incremental.update() == 72
+
+    with open(generation, 'a') as f:
+        f.writelines(generation_rows(range(10, 20)))
+    with open(grid, 'a') as f:
+        f.writelines(grid_rows(range(10, 20)))
+    # Only the appended rows are read
+    assert incremental.update() == 80
+    assert incremental.update() == 0
+
+    full = RollupStore([generation, grid], str(tmp_path / 'full.db'))
+    assert full.update() == 152
+    assert summaries(incremental) == summaries(full)
+
+
+def test_partial_trailing_line_waits_for_the_next_update(tmp_path, sources):
+    generation, _ = sources
+    write(generation, GENERATION_HEADER, generation_rows([1]))
+    with open(generation, 'a') as f:
+        f.write('2024-01-02 00:00:00,5.0,0.99,')
+    store = RollupStore([generation], str(tmp_path / 'rollups.db'))
+    assert store.update() == 4
+    with open(generation, 'a') as f:
+        f.write('1.0,7.0\n')
+    assert store.update() == 1
+    assert [bucket['rows'] for bucket in store.summary('daily')] == [4, 1]
+
+
+def test_rewritten_source_is_rebuilt(tmp_path, sources):
+    generation, _ = sources
+    write(generation, GENERATION_HEADER, generation_rows(range(1, 5)))
+    store = RollupStore([generation], str(tmp_path / 'rollups.db'))
+    store.update()
+    write(generation, GENERATION_HEADER, generation_rows([1]))
+    store.update()
+    assert [bucket['rows'] for bucket in store.summary('daily')] == [4]
+
+
+def test_etag_changes_only_with_the_data(tmp_path, sources):
+    generation, _ = sources
+    write(generation, GENERATION_HEADER, generation_rows([1]))
+    store = RollupStore([generation], str(tmp_path / 'rollups.db'))
+    store.update()
+    etag, body = store.rendered('daily')
+    store.update()
+    assert store.rendered('daily') == (etag, body)
+    with open(generation, 'a') as f:
+        f.writelines(generation_rows([2]))
+    store.update()
+    assert store.rendered('daily')[0] != etag
+
+
+def test_endpoint_answers_304_for_a_current_etag(app1, tmp_path, sources, monkeypatch):
+    generation, _ = sources
+    write(generation, GENERATION_HEADER, generation_rows([1]))
+    monkeypatch.setattr(app1, 'rollup_store', RollupStore([generation], str(tmp_path / 'rollups.db')))
+    client = app1.app.test_client()
+
+    response = client.get('/api/rollups?period=daily')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert client.get('/api/rollups?period=daily', headers={'If-None-Match': etag}).status_code == 304
+
+    with open(generation, 'a') as f:
+        f.writelines(generation_rows([2]))
+    app1.rollup_store.update()
+    response = client.get('/api/rollups?period=daily', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['buckets']) == 2
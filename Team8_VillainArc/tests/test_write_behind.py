@@ -0,0 +1,103 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from write_behind import WriteBehindLogger
+
+
+@pytest.fixture
+def db(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "log.db"}'
+    db = SQLAlchemy(app)
+    db.log_table = sa.Table('log', db.metadata, sa.Column('value', sa.Integer))
+    with app.app_context():
+        db.create_all()
+    db.app = app
+    return db
+
+
+def stored(db):
+    with db.app.app_context(), db.engine.connect() as connection:
+        return [row[0] for row in connection.execute(sa.select(db.log_table.c.value))]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class FlakyEngine:
+    """Stands in for db.engine, raising 'database is locked' for the first `failures` transactions."""
+
+    def __init__(self, db, failures):
+        self.db = db
+        self.failures = failures
+
+    def begin(self):
+        if self.failures:
+            self.failures -= 1
+            raise sa.exc.OperationalError('INSERT', {}, Exception('database is locked'))
+        return self.db.engine.begin()
+
+
+class FlakyDb:
+
+    def __init__(self, db, failures):
+        self.engine = FlakyEngine(db, failures)
+
+
+def test_flushes_when_flush_size_rows_are_queued(db):
+    log = WriteBehindLogger(db.app, db, db.log_table, flush_size=5, flush_interval=60.0)
+    for i in range(5):
+        log.log(value=i)
+    wait_for(lambda: log.rows_written == 5)
+    assert sorted(stored(db)) == list(range(5))
+    assert log.flushes == 1
+
+
+def test_flushes_after_flush_interval(db):
+    log = WriteBehindLogger(db.app, db, db.log_table, flush_size=1000, flush_interval=0.05)
+    log.log(value=1)
+    log.log(value=2)
+    wait_for(lambda: log.rows_written == 2)
+    assert sorted(stored(db)) == [1, 2]
+
+
+def test_close_writes_pending_rows(db):
+    log = WriteBehindLogger(db.app, db, db.log_table, flush_size=1000, flush_interval=0.2)
+    for i in range(3):
+        log.log(value=i)
+    log.close()
+    assert sorted(stored(db)) == [0, 1, 2]
+    assert not log._thread.is_alive()
+    assert log.stats()['queued'] == 0
+
+
+def test_failed_flush_is_retried(db):
+    log = WriteBehindLogger(db.app, FlakyDb(db, failures=2), db.log_table, flush_size=1000, flush_interval=0.02)
+    for i in range(3):
+        log.log(value=i)
+    wait_for(lambda: log.rows_written == 3)
+    log.close()
+    assert sorted(stored(db)) == [0, 1, 2]
+    assert log.errors == 2
+    assert log.dropped == 0
+
+
+def test_rows_are_counted_as_dropped_after_max_retries(db):
+    log = WriteBehindLogger(db.app, FlakyDb(db, failures=100), db.log_table, flush_size=1000,
+                            flush_interval=0.02, max_retries=2)
+    for i in range(3):
+        log.log(value=i)
+    wait_for(lambda: log.dropped == 3)
+    log.close()
+    assert stored(db) == []
+    assert log.errors == 3
+    assert log.stats()['pending'] == 0
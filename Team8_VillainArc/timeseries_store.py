@@ -0,0 +1,136 @@
+"""Indexed SQLite store for historical wind generation data.
+
+Rows are keyed on their timestamp (unix seconds, INTEGER PRIMARY KEY), which
+is SQLite's clustered rowid, so a time-range query is a B-tree seek plus a
+sequential scan of just the rows in range. Hourly and daily aggregates are
+grouped in SQL over that same range.
+
+    python timeseries_store.py ingest wind_power_gen_5years_training_data.csv wind_power_gen_3months_validation_data.csv
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from batch_predict import WEATHER_FEATURES, iter_weather_chunks
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'timeseries.db')
+
+COLUMNS = ['air_temp', 'pressure', 'wind_speed', 'power_gen']
+CSV_COLUMNS = WEATHER_FEATURES + ['PowerGen']
+
+FREQUENCIES = {'raw': None, 'hourly': 3600, 'daily': 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation (
+    ts INTEGER PRIMARY KEY,
+    air_temp REAL NOT NULL,
+    pressure REAL NOT NULL,
+    wind_speed REAL NOT NULL,
+    power_gen REAL NOT NULL
+)
+"""
+
+
+def connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+
+def to_epoch(value):
+    """Unix seconds for an ISO date/datetime string or numpy datetime64."""
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+def from_epoch(ts):
+    return str(np.datetime64(int(ts), 's')).replace('T', ' ')
+
+
+class TimeSeriesStore:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.path)
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ********************************** Ingestion **********************************
+    def ingest_csv(self, path, chunk_size=10000):
+        """Load a DateTime,AirTemp,Pressure,WindSpeed,PowerGen CSV; re-ingesting replaces rows."""
+        conn = self.connection()
+        rows = 0
+        with open(path, newline='') as f, conn:
+            for timestamps, X in iter_weather_chunks(f, chunk_size, CSV_COLUMNS):
+                ts = np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO generation (ts, {", ".join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)',
+                    zip(ts.tolist(), *(X[:, i].tolist() for i in range(X.shape[1]))))
+                rows += len(ts)
+        return rows
+
+    def count(self):
+        return self.connection().execute('SELECT COUNT(*) FROM generation').fetchone()[0]
+
+    # ********************************** Queries **********************************
+    def query(self, start, end):
+        """Raw rows with start <= ts < end."""
+        cursor = self.connection().execute(
+            f'SELECT ts, {", ".join(COLUMNS)} FROM generation WHERE ts >= ? AND ts < ? ORDER BY ts',
+            (start, end))
+        return [dict(zip(['ts'] + COLUMNS, row)) for row in cursor]
+
+    def aggregate(self, start, end, step):
+        """Per-bucket mean of every column plus min/max PowerGen for buckets of step seconds."""
+        cursor = self.connection().execute(
+            'SELECT (ts / :step) * :step AS bucket, COUNT(*), AVG(air_temp), AVG(pressure), AVG(wind_speed), '
+            'AVG(power_gen), MIN(power_gen), MAX(power_gen) '
+            'FROM generation WHERE ts >= :start AND ts < :end GROUP BY bucket ORDER BY bucket',
+            {'step': step, 'start': start, 'end': end})
+        names = ['ts', 'count', 'air_temp_mean', 'pressure_mean', 'wind_speed_mean',
+                 'power_gen_mean', 'power_gen_min', 'power_gen_max']
+        return [dict(zip(names, row)) for row in cursor]
+
+    def history(self, start, end, freq='raw'):
+        if freq not in FREQUENCIES:
+            raise ValueError(f'freq must be one of {", ".join(FREQUENCIES)}.')
+        start, end = to_epoch(start), to_epoch(end)
+        step = FREQUENCIES[freq]
+        rows = self.query(start, end) if step is None else self.aggregate(start, end, step)
+        for row in rows:
+            row['DateTime'] = from_epoch(row.pop('ts'))
+        return rows
+
+
+# ********************************** Command line **********************************
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load generation CSVs into the time-series store.')
+    parser.add_argument('--db', default=DEFAULT_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='load DateTime,AirTemp,Pressure,WindSpeed,PowerGen CSVs')
+    ingest.add_argument('csv', nargs='+')
+    args = parser.parse_args(argv)
+
+    store = TimeSeriesStore(args.db)
+    for path in args.csv:
+        start = time.perf_counter()
+        rows = store.ingest_csv(path)
+        print(f'{path}: {rows} rows in {time.perf_counter() - start:.2f}s')
+    print(f'{store.count()} rows in {args.db}')
+
+
+if __name__ == '__main__':
+    main()
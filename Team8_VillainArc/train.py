@@ -0,0 +1,215 @@
+"""Train and publish the power generation and grid stability models.
+
+Replaces the training cells of PowerGen.ipynb. Each run reads only the needed
+columns with explicit dtypes, fits a random forest on all cores, records fit
+time, peak memory and hold-out metrics, and publishes a versioned artifact:
+
+    instance/models/<name>-<version>.joblib   the model
+    instance/models/<name>-<version>.json     its training report
+    instance/models/<name>.json               manifest naming the current version
+
+Both files are written under a temporary name and renamed into place, so
+app1.py (via model_registry.resolve_model_path) never sees a partial model.
+Rows of HOLDOUT_DATA that model_manager validates new versions on are never
+fitted on.
+
+    python train.py power --data ../Data/wind_power_gen_5years_training_data.csv
+    python train.py power --data new_month.csv --warm-start --add-trees 20
+    python train.py stability --data ../Data/grid_stability_3months_validation_data.csv
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+from batch_predict import WEATHER_FEATURES
+from model_registry import DEFAULT_MODEL_DIR, FLAT_SUFFIX, new_version, resolve_model_path, write_manifest
+from pipeline import GRID_FEATURES
+
+STABILITY_FEATURES = GRID_FEATURES + ['PowerGen', 'power_gen1', 'power_gen2', 'power_gen3']
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data')
+# CSVs model_manager validates new versions on. Every HOLDOUT_EVERY-th row is reserved for that check and
+# never fitted on, since the stability model has no other data to be trained on
+HOLDOUT_DATA = {
+    'power': os.path.join(DATA_DIR, 'wind_power_gen_3months_validation_data.csv'),
+    'stability': os.path.join(DATA_DIR, 'grid_stability_3months_validation_data.csv'),
+}
+HOLDOUT_EVERY = 5
+
+# name: artifact name app1.py loads, columns: CSV dtypes, features/target: model input and label
+MODELS = {
+    'power': {
+        'name': 'final_power_gen_model',
+        'columns': {name: 'float64' for name in WEATHER_FEATURES + ['PowerGen']},
+        'features': WEATHER_FEATURES,
+        'target': 'PowerGen',
+    },
+    'stability': {
+        'name': 'FinalPred',
+        'columns': dict({name: 'float64' for name in STABILITY_FEATURES}, stability='category'),
+        'features': STABILITY_FEATURES,
+        'target': 'stability',
+    },
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def load_training_data(kind, path):
+    import pandas as pd
+
+    spec = MODELS[kind]
+    data = pd.read_csv(path, usecols=list(spec['columns']), dtype=spec['columns'])
+    X = data[spec['features']].to_numpy(dtype=np.float64)
+    if kind == 'stability':
+        # predict_result() treats 1 as Stable
+        y = (data[spec['target']].str.strip().str.lower() == 'stable').to_numpy(dtype=np.int64)
+    else:
+        y = data[spec['target']].to_numpy(dtype=np.float64)
+    return X, y
+
+
+def holdout_mask(kind, path, n):
+    """Rows of a CSV reserved for validating new versions, or None when it is not a hold-out CSV."""
+    if os.path.abspath(path) != os.path.abspath(HOLDOUT_DATA[kind]):
+        return None
+    return np.arange(n) % HOLDOUT_EVERY == 0
+
+
+def warm_start_source(name, model_dir=DEFAULT_MODEL_DIR):
+    """Published scikit-learn artifact to add trees to.
+
+    A FlatForest published by compress.py cannot be fitted further, so then the
+    newest published scikit-learn version is used instead.
+    """
+    path = resolve_model_path(name, model_dir)
+    if not path.endswith(FLAT_SUFFIX):
+        return path
+    published = sorted(p for p in glob.glob(os.path.join(model_dir, f'{glob.escape(name)}-*.joblib'))
+                       if not p.endswith(FLAT_SUFFIX))
+    if not published:
+        raise SystemExit(f'{os.path.basename(path)} is a compressed FlatForest and no scikit-learn version of '
+                         f'{name} is published to warm-start from; train without --warm-start.')
+    return published[-1]
+
+
+def build_model(kind, args, base=None):
+    """A new forest, or the model at base with --add-trees more trees to fit."""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    if base is not None:
+        model = joblib.load(base)
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + args.add_trees, n_jobs=args.n_jobs)
+        return model
+    forest = RandomForestClassifier if kind == 'stability' else RandomForestRegressor
+    return forest(n_estimators=args.n_estimators, max_depth=args.max_depth,
+                  min_samples_leaf=args.min_samples_leaf, n_jobs=args.n_jobs, random_state=args.random_state)
+
+
+def evaluate(kind, model, X_test, y_test):
+    from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
+
+    y_pred = model.predict(X_test)
+    if kind == 'stability':
+        return {'accuracy': accuracy_score(y_test, y_pred), 'f1': f1_score(y_test, y_pred)}
+    return {'mse': mean_squared_error(y_test, y_pred), 'r2': r2_score(y_test, y_pred)}
+
+
+def publish(model, report, name, model_dir):
+    """Write the artifact and report, then atomically repoint the <name>.json manifest."""
+    import joblib
+
+    os.makedirs(model_dir, exist_ok=True)
+    version = report['version']
+    artifact = f'{name}-{version}.joblib'
+
+    def write_atomic(filename, write):
+        path = os.path.join(model_dir, filename)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        write(tmp)
+        os.replace(tmp, path)
+        return path
+
+    def dump_json(payload):
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(payload, f, indent=2)
+        return write
+
+    # The training-time n_jobs would make every request fan out over all cores
+    model.set_params(n_jobs=None, warm_start=False)
+    path = write_atomic(artifact, lambda tmp: joblib.dump(model, tmp))
+    write_atomic(f'{name}-{version}.json', dump_json(report))
+    write_manifest(name, {'name': name, 'version': version, 'artifact': artifact, 'metrics': report['metrics']},
+                   model_dir)
+    return path
+
+
+def train(kind, args):
+    from sklearn.model_selection import train_test_split
+
+    start = time.perf_counter()
+    X, y = load_training_data(kind, args.data)
+    load_s = time.perf_counter() - start
+    reserved = holdout_mask(kind, args.data, len(X))
+    if reserved is not None:
+        X, y = X[~reserved], y[~reserved]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.random_state)
+
+    base = warm_start_source(MODELS[kind]['name'], args.model_dir) if args.warm_start else None
+    model = build_model(kind, args, base)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    report = {
+        'model': kind,
+        'version': new_version(MODELS[kind]['name'], args.model_dir),
+        'data': os.path.abspath(args.data),
+        'rows': {'train': len(X_train), 'test': len(X_test),
+                 'reserved': 0 if reserved is None else int(reserved.sum())},
+        'n_estimators': len(model.estimators_),
+        'warm_start': args.warm_start,
+        'base_artifact': base and os.path.basename(base),
+        'load_seconds': load_s,
+        'fit_seconds': fit_s,
+        'peak_rss_mb': peak_rss_mb(),
+        'metrics': evaluate(kind, model, X_test, y_test),
+    }
+    report['artifact'] = publish(model, report, MODELS[kind]['name'], args.model_dir)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train and publish a SustainaWatt model.')
+    parser.add_argument('model', choices=sorted(MODELS))
+    parser.add_argument('--data', required=True, help='training CSV')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-depth', type=int, default=None)
+    parser.add_argument('--min-samples-leaf', type=int, default=1)
+    parser.add_argument('--n-jobs', type=int, default=-1, help='cores used for fitting (-1 = all)')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--random-state', type=int, default=42)
+    parser.add_argument('--warm-start', action='store_true',
+                        help='add trees fitted on --data to the currently published model')
+    parser.add_argument('--add-trees', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    report = train(args.model, args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
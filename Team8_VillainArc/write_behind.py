@@ -0,0 +1,138 @@
+import atexit
+import queue
+import threading
+import time
+
+from metrics import db_commit_seconds
+
+
+class WriteBehindLogger:
+    """Queue rows for a table and insert them in bulk from a background thread.
+
+    Requests only pay for a queue put. The writer flushes when flush_size rows
+    are waiting or flush_interval seconds have passed, using one executemany
+    INSERT per flush, so a burst of requests shares a single transaction and
+    fsync. A failed flush keeps its rows at the head of the buffer and retries
+    them on the next interval, up to max_retries times, before they are
+    discarded and counted in dropped. Pending rows are flushed on close(),
+    which runs at interpreter exit.
+    """
+
+    def __init__(self, app, db, table, flush_size=500, flush_interval=1.0, max_queue=100000, max_retries=3):
+        self.app = app
+        self.db = db
+        self.table = table
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = queue.Queue(max_queue)
+        # Rows taken off the queue but not yet written; guarded by _flush_lock
+        self._buffer = []
+        self._failures = 0
+        self._flush_lock = threading.Lock()
+        # dropped is also counted on request threads, which must not wait for a flush
+        self._dropped_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.table.name}', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def log(self, **row):
+        self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Shed log rows rather than block requests when the database falls behind
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Write everything queued so far; safe to call from any thread."""
+        with self._flush_lock:
+            while True:
+                try:
+                    self._buffer.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_buffer()
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        # No writer is left to retry failed rows later
+        for _ in range(self.max_retries):
+            if not self._buffer:
+                break
+            self.flush()
+
+    def stats(self):
+        return {
+            'table': self.table.name,
+            'queued': self._queue.qsize(),
+            'pending': len(self._buffer),
+            'rows_written': self.rows_written,
+            'flushes': self.flushes,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'last_flush_ms': self.last_flush_ms,
+        }
+
+    # ********************************** Background writer **********************************
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stopped.is_set():
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = None
+            with self._flush_lock:
+                if row is not None:
+                    self._buffer.append(row)
+                # After a failure, wait for the interval before retrying rather than on every new row
+                full = len(self._buffer) >= self.flush_size and not self._failures
+                if full or time.monotonic() >= deadline:
+                    self._write_buffer()
+                    deadline = time.monotonic() + self.flush_interval
+
+    def _write_buffer(self):
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as connection:
+                    connection.execute(self.table.insert(), rows)
+        except Exception as e:
+            self.errors += 1
+            if self._failures < self.max_retries:
+                self._failures += 1
+                self._buffer = rows + self._buffer
+                self.app.logger.warning('Write-behind flush of %d %s rows failed (attempt %d), will retry: %s',
+                                        len(rows), self.table.name, self._failures, e)
+            else:
+                self._failures = 0
+                with self._dropped_lock:
+                    self.dropped += len(rows)
+                self.app.logger.error('Write-behind flush of %d %s rows failed, discarding them: %s',
+                                      len(rows), self.table.name, e)
+            return
+        self._failures = 0
+        elapsed = time.perf_counter() - started
+        db_commit_seconds.observe(elapsed, self.table.name)
+        self.last_flush_ms = elapsed * 1000.0
+        self.rows_written += len(rows)
+        self.flushes += 1